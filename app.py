@@ -14,7 +14,7 @@ from utils import zerodha_login
 from dotenv import load_dotenv
 from memory_manager import memory_manager, cleanup_dataframes, force_gc
 from logging_config import setup_logging
-from redis_utils import get_instrument_cache, set_instrument_cache, is_duplicate
+from redis_utils import get_instrument_cache, get_instrument_cache_many, set_instrument_cache, is_duplicate_async
 import pytz
 from dateutil import parser as dtparser
 import json
@@ -178,9 +178,10 @@ async def lifespan(app: FastAPI):
                 instrument_lookups = {}
                 df_cache = {}  # Store DataFrames for cleanup
                 try:
+                    cached_frames = get_instrument_cache_many(segments)
                     for seg in segments:
                         try:
-                            df = get_instrument_cache(seg)
+                            df = cached_frames.get(seg)
                             if df is not None:
                                 df_cache[seg] = df  # Store for cleanup
                                 instrument_lookups[seg] = df.set_index('tradingsymbol')['name'].to_dict()
@@ -202,7 +203,7 @@ async def lifespan(app: FastAPI):
                 try:
                     # Use async executor to prevent blocking event loop
                     positions = await asyncio.wait_for(
-                        asyncio.get_event_loop().run_in_executor(None, lambda: kite.positions()["net"]),
+                        asyncio.get_running_loop().run_in_executor(None, lambda: kite.positions()["net"]),
                         timeout=5.0  # 5 second timeout
                     )
                 except asyncio.TimeoutError:
@@ -420,7 +421,7 @@ def save_and_refresh_token(token: str = Form(...)) -> HTMLResponse:
 import asyncio
 
 async def place_order_async(kite, *args, **kwargs):
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
     return await loop.run_in_executor(None, place_order, kite, *args, **kwargs)
 
 @app.post("/webhook", response_model=None)
@@ -463,7 +464,7 @@ async def webhook(
     if not timestamp:
         logging.error("No timestamp provided in payload. Cannot ensure idempotency.")
         return JSONResponse(content={"status": "error", "message": "No timestamp in payload."}, status_code=400)
-    if is_duplicate(symbol, timestamp):
+    if await is_duplicate_async(symbol, timestamp):
         logging.info(f"Duplicate alert received for symbol {symbol} at timestamp {timestamp}. Skipping processing.")
         return JSONResponse(content={"status": "duplicate", "message": "Alert already processed for this symbol and time."}, status_code=200)
     try:
@@ -501,10 +502,12 @@ async def webhook(
         # Clear request-level cache at start of each webhook
         perf_optimizer.clear_request_cache()
         
-        webhook_start_time = time.time()
+        webhook_start_time = time.perf_counter()
 
-        # Process account with request ID context
-        result = await process_account_optimized(kite, "account", tv_symbol, segment, action, price, quantity, time_received, req_id)
+        # Process account with request ID context. Contract resolution is started lazily
+        # inside, after the skip checks, and shared across accounts by the request cache.
+        result = await process_account_optimized(kite, "account", tv_symbol, segment, action, price, quantity,
+                                                 time_received, req_id, kite_factory=lambda: kite)
         
         log_with_request_id('INFO', 
             "Account processing completed",
@@ -513,10 +516,10 @@ async def webhook(
         )
         
         # Calculate total webhook processing time
-        total_processing_time = (time.time() - webhook_start_time) * 1000
+        total_processing_time = (time.perf_counter() - webhook_start_time) * 1000
         
         # Record performance metrics
-        perf_monitor.record_request(total_processing_time, req_id)
+        await perf_monitor.record_request(total_processing_time, req_id)
         
         response = {
             "account": result,
@@ -1,7 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from app import app, WEBHOOK_SECRET, API_SECRET
+from performance_optimizations import perf_optimizer
 
 # Create a test client for the FastAPI app
 client = TestClient(app)
@@ -10,7 +11,7 @@ client = TestClient(app)
 def mock_dependencies():
     """Mock external dependencies for all tests in this file."""
     with patch('app.zerodha_login', return_value=MagicMock()) as mock_login, \
-         patch('app.is_duplicate') as mock_is_duplicate, \
+         patch('app.is_duplicate_async', new_callable=AsyncMock) as mock_is_duplicate, \
          patch('app.place_order') as mock_place_order, \
          patch('app.get_top_3_futures_from_tv_symbol') as mock_get_contracts:
         
@@ -79,4 +80,56 @@ def test_token_save_and_refresh_failure():
     with patch('app.kite.generate_session', side_effect=Exception("Invalid token")):
         response = client.post("/token", data={"token": "invalid_request_token"})
         assert response.status_code == 500
-        assert "An internal error occurred" in response.text 
\ No newline at end of file
+        assert "An internal error occurred" in response.text
+
+
+@pytest.fixture
+def futures_kite():
+    """Account kite plus the instrument lookup/order path used by the NFO webhook flow."""
+    perf_optimizer.last_state.clear()  # cross-request position cache
+    kite = MagicMock()
+    kite.holdings.return_value = []
+    contracts = [
+        {'tradingsymbol': 'NIFTY24JULFUT', 'expiry': '2099-07-25', 'lot_size': 50},
+        {'tradingsymbol': 'NIFTY24AUGFUT', 'expiry': '2099-08-29', 'lot_size': 50},
+    ]
+    with patch('app.kite', kite), \
+         patch('performance_optimizations.get_top_3_futures_from_tv_symbol', return_value=contracts) as mock_lookup, \
+         patch('performance_optimizations.get_contracts_redis', return_value=None) as mock_redis_lookup, \
+         patch('performance_optimizations.set_contracts_redis'), \
+         patch('performance_optimizations.place_order', return_value=("12345", None)) as mock_place, \
+         patch('performance_optimizations.PerformanceMonitor.record_request', new_callable=AsyncMock):
+        yield {"kite": kite, "lookup": mock_lookup, "redis_lookup": mock_redis_lookup, "place_order": mock_place}
+
+def test_webhook_futures_buy_skipped_without_contract_lookup(mock_dependencies, futures_kite):
+    """A buy on an existing futures long returns before any contract lookup starts."""
+    mock_dependencies['is_duplicate'].return_value = False
+    futures_kite['kite'].positions.return_value = {"net": [
+        {'tradingsymbol': 'NIFTY24JULFUT', 'exchange': 'NFO', 'quantity': 50},
+    ]}
+
+    response = client.post(
+        f"/webhook?token={WEBHOOK_SECRET}",
+        json={"action": "buy", "symbol": "NIFTY1!", "segment": "NFO", "time": "2024-01-01T12:00:00Z"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["account"]["status"] == "already holding, buy skipped"
+    futures_kite['redis_lookup'].assert_not_called()
+    futures_kite['lookup'].assert_not_called()
+    futures_kite['place_order'].assert_not_called()
+
+def test_webhook_futures_buy_resolves_contract_when_flat(mock_dependencies, futures_kite):
+    """A flat account resolves the contract once and enters the front month."""
+    mock_dependencies['is_duplicate'].return_value = False
+    futures_kite['kite'].positions.return_value = {"net": []}
+
+    response = client.post(
+        f"/webhook?token={WEBHOOK_SECRET}",
+        json={"action": "buy", "symbol": "NIFTY1!", "segment": "NFO", "time": "2024-01-01T12:00:00Z"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["account"]["status"] == "buy order placed"
+    assert futures_kite['lookup'].call_count == 1
+    assert futures_kite['place_order'].call_args[0][1] == 'NIFTY24JULFUT'
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Ahead-of-time compile the FIFO PnL kernel with numba.pycc
+
+Produces the pnl_kernels extension module next to database.py, which
+database.py imports in preference to the JIT version so nothing is
+compiled at runtime. Re-run after changing pnl_kernel_src.fifo_pnl.
+
+Usage: python build_kernels.py
+"""
+
+import os
+from numba.pycc import CC
+
+from pnl_kernel_src import fifo_pnl
+
+cc = CC("pnl_kernels")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export("fifo_pnl", "Tuple((f8, i8, f8))(i8[:], f8[:], i8[:], f8[:])")(fifo_pnl)
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"✅ Built pnl_kernels in {cc.output_dir}")
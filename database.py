@@ -2,18 +2,48 @@ import sqlite3
 import logging
 from datetime import datetime
 from typing import Optional, List, Dict, Any, Tuple
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 import os
+import numpy as np
+
+from pnl_kernel_src import fifo_pnl_jit
 
 logger = logging.getLogger(__name__)
 
+try:
+    # Ahead-of-time compiled copy of the kernel (see build_kernels.py): no JIT warmup
+    from pnl_kernels import fifo_pnl
+except ImportError:
+    fifo_pnl = fifo_pnl_jit
+
 class OrderDatabase:
     """SQLite database manager for order logging and PnL tracking"""
     
+    # Per-connection pragmas applied once enable_fast_writes() has been called
+    FAST_WRITE_PRAGMAS = (
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-65536",  # 64 MiB page cache
+    )
+    
     def __init__(self, db_path: str = "trading_orders.db"):
         self.db_path = db_path
+        self.fast_writes = False
         self.init_database()
     
+    def enable_fast_writes(self):
+        """Switch to WAL journaling with synchronous=NORMAL.
+
+        WAL is persisted in the database file; the remaining pragmas are
+        per-connection and applied by get_connection from now on. A crash can
+        lose the last few commits (never corrupt the file), so this is meant
+        for forward testing and bulk test data, not live order logging.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+        self.fast_writes = True
+        logger.info("⚡ SQLite fast writes enabled (WAL, synchronous=NORMAL)")
+    
     def init_database(self):
         """Initialize database with required tables"""
         try:
@@ -81,6 +111,8 @@ class OrderDatabase:
                 # Create indexes for better performance
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_symbol ON orders(tradingsymbol)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_timestamp ON orders(timestamp)')
+                # PnL lookups filter on all three columns
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_sym_exch_status ON orders(tradingsymbol, exchange, status)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(tradingsymbol)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_trades_execution_time ON trades(execution_time)')
                 
@@ -98,6 +130,9 @@ class OrderDatabase:
         try:
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row  # Enable dict-like access
+            if self.fast_writes:
+                for pragma in self.FAST_WRITE_PRAGMAS:
+                    conn.execute(pragma)
             yield conn
         except Exception as e:
             if conn:
@@ -108,6 +143,17 @@ class OrderDatabase:
             if conn:
                 conn.close()
     
+    @contextmanager
+    def transaction(self):
+        """Context manager for a batch of writes committed once on exit.
+
+        Pass the yielded connection as ``conn`` to log_order_attempt /
+        update_order_result; they then skip their own per-call commit.
+        """
+        with self.get_connection() as conn:
+            yield conn
+            conn.commit()
+    
     def log_order_attempt(self, 
                          tradingsymbol: str,
                          exchange: str,
@@ -118,11 +164,12 @@ class OrderDatabase:
                          product: str,
                          webhook_timestamp: str = None,
                          tv_symbol: str = None,
-                         request_id: str = None) -> int:
+                         request_id: str = None,
+                         conn: sqlite3.Connection = None) -> int:
         """Log order attempt before placing order"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
+            with nullcontext(conn) if conn is not None else self.get_connection() as db:
+                cursor = db.cursor()
                 
                 cursor.execute('''
                     INSERT INTO orders (
@@ -137,7 +184,8 @@ class OrderDatabase:
                 ))
                 
                 order_log_id = cursor.lastrowid
-                conn.commit()
+                if conn is None:
+                    db.commit()
                 
                 logger.info(f"📝 Order attempt logged: ID={order_log_id}, {transaction_type} {quantity} {tradingsymbol}")
                 return order_log_id
@@ -146,15 +194,58 @@ class OrderDatabase:
             logger.error(f"❌ Failed to log order attempt: {e}", exc_info=True)
             return None
     
+    def log_order_attempt_batch(self,
+                                orders: List[Dict[str, Any]],
+                                conn: sqlite3.Connection = None) -> List[int]:
+        """Log many order attempts with one prepared INSERT.
+
+        Each dict takes the same keys as log_order_attempt. Rows are bound
+        and stepped inside sqlite3's executemany, so the per-row cost stays
+        in C. Returns the new row IDs in input order.
+        """
+        if not orders:
+            return []
+        try:
+            with nullcontext(conn) if conn is not None else self.get_connection() as db:
+                cursor = db.cursor()
+                now = datetime.now()
+                
+                cursor.executemany('''
+                    INSERT INTO orders (
+                        tradingsymbol, exchange, transaction_type, quantity, 
+                        price, order_type, product, timestamp, webhook_timestamp,
+                        tv_symbol, request_id, status
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'ATTEMPTING')
+                ''', [
+                    (o['tradingsymbol'], o['exchange'], o['transaction_type'], o['quantity'],
+                     o['price'], o['order_type'], o['product'], now,
+                     o.get('webhook_timestamp'), o.get('tv_symbol'), o.get('request_id'))
+                    for o in orders
+                ])
+                
+                # Rows inserted inside one write transaction get consecutive rowids
+                last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+                order_log_ids = list(range(last_id - len(orders) + 1, last_id + 1))
+                if conn is None:
+                    db.commit()
+                
+                logger.info(f"📝 {len(orders)} order attempts logged: IDs={order_log_ids[0]}..{order_log_ids[-1]}")
+                return order_log_ids
+                
+        except Exception as e:
+            logger.error(f"❌ Failed to log order attempt batch: {e}", exc_info=True)
+            return []
+    
     def update_order_result(self, 
                            order_log_id: int,
                            order_id: str = None,
                            status: str = 'SUCCESS',
-                           error_message: str = None):
+                           error_message: str = None,
+                           conn: sqlite3.Connection = None):
         """Update order result after placement attempt"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
+            with nullcontext(conn) if conn is not None else self.get_connection() as db:
+                cursor = db.cursor()
                 
                 cursor.execute('''
                     UPDATE orders 
@@ -162,13 +253,49 @@ class OrderDatabase:
                     WHERE id = ?
                 ''', (order_id, status, error_message, datetime.now(), order_log_id))
                 
-                conn.commit()
+                if conn is None:
+                    db.commit()
                 
                 logger.info(f"📝 Order result updated: ID={order_log_id}, Status={status}, OrderID={order_id}")
                 
         except Exception as e:
             logger.error(f"❌ Failed to update order result: {e}", exc_info=True)
     
+    def update_order_result_batch(self,
+                                  results: List[Dict[str, Any]],
+                                  conn: sqlite3.Connection = None) -> int:
+        """Update many order results with one prepared UPDATE.
+
+        Each dict takes the same keys as update_order_result (order_log_id,
+        order_id, status, error_message). Returns the number of rows updated.
+        """
+        if not results:
+            return 0
+        try:
+            with nullcontext(conn) if conn is not None else self.get_connection() as db:
+                cursor = db.cursor()
+                now = datetime.now()
+                
+                cursor.executemany('''
+                    UPDATE orders 
+                    SET order_id = ?, status = ?, error_message = ?, updated_at = ?
+                    WHERE id = ?
+                ''', [
+                    (r.get('order_id'), r.get('status', 'SUCCESS'), r.get('error_message'), now, r['order_log_id'])
+                    for r in results
+                ])
+                
+                updated = cursor.rowcount
+                if conn is None:
+                    db.commit()
+                
+                logger.info(f"📝 {updated} order results updated")
+                return updated
+                
+        except Exception as e:
+            logger.error(f"❌ Failed to update order result batch: {e}", exc_info=True)
+            return 0
+    
     def get_recent_orders(self, limit: int = 50) -> List[Dict]:
         """Get recent orders for dashboard"""
         try:
@@ -198,13 +325,13 @@ class OrderDatabase:
                     cursor.execute('''
                         SELECT * FROM orders 
                         WHERE tradingsymbol = ? AND exchange = ?
-                        ORDER BY timestamp ASC
+                        ORDER BY timestamp ASC, id ASC
                     ''', (tradingsymbol, exchange))
                 else:
                     cursor.execute('''
                         SELECT * FROM orders 
                         WHERE tradingsymbol = ?
-                        ORDER BY timestamp ASC
+                        ORDER BY timestamp ASC, id ASC
                     ''', (tradingsymbol,))
                 
                 orders = [dict(row) for row in cursor.fetchall()]
@@ -216,13 +343,25 @@ class OrderDatabase:
     
     def calculate_symbol_pnl(self, tradingsymbol: str, exchange: str) -> Dict[str, Any]:
         """Calculate PnL for a specific symbol using FIFO method"""
+        # Successful orders (including forward test orders for analysis) with a broker order ID
+        filled = """
+            tradingsymbol = ? AND exchange = ?
+            AND status IN ('SUCCESS', 'FORWARD_TEST_SUCCESS')
+            AND order_id IS NOT NULL AND order_id != ''
+        """
         try:
-            orders = self.get_orders_by_symbol(tradingsymbol, exchange)
-            
-            # Filter successful orders (including forward test orders for analysis)
-            successful_orders = [o for o in orders if o['status'] in ['SUCCESS', 'FORWARD_TEST_SUCCESS'] and o['order_id']]
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                # One ordered scan serves both the totals and the FIFO matching
+                cursor.execute(f"""
+                    SELECT * FROM orders
+                    WHERE {filled}
+                    ORDER BY timestamp ASC, id ASC
+                """, (tradingsymbol, exchange))
+                rows = cursor.fetchall()
             
-            if not successful_orders:
+            if not rows:
                 return {
                     'tradingsymbol': tradingsymbol,
                     'exchange': exchange,
@@ -235,26 +374,26 @@ class OrderDatabase:
                     'trades': []
                 }
             
-            # Separate buy and sell orders
-            buy_orders = [o for o in successful_orders if o['transaction_type'] == 'BUY']
-            sell_orders = [o for o in successful_orders if o['transaction_type'] == 'SELL']
-            
-            # Calculate totals
-            total_buy_qty = sum(o['quantity'] for o in buy_orders)
-            total_sell_qty = sum(o['quantity'] for o in sell_orders)
+            # Separate buy and sell orders, accumulating totals on the same pass
+            buy_orders, sell_orders = [], []
+            total_buy_qty = total_sell_qty = 0
+            total_buy_value = total_sell_value = 0.0
+            for row in rows:
+                order = dict(row)
+                value = order['quantity'] * (order['price'] or 0)
+                if order['transaction_type'] == 'BUY':
+                    buy_orders.append(order)
+                    total_buy_qty += order['quantity']
+                    total_buy_value += value
+                elif order['transaction_type'] == 'SELL':
+                    sell_orders.append(order)
+                    total_sell_qty += order['quantity']
+                    total_sell_value += value
             current_position = total_buy_qty - total_sell_qty
             
             # Calculate average prices
-            avg_buy_price = 0.0
-            avg_sell_price = 0.0
-            
-            if buy_orders:
-                total_buy_value = sum(o['quantity'] * (o['price'] or 0) for o in buy_orders)
-                avg_buy_price = total_buy_value / total_buy_qty if total_buy_qty > 0 else 0
-            
-            if sell_orders:
-                total_sell_value = sum(o['quantity'] * (o['price'] or 0) for o in sell_orders)
-                avg_sell_price = total_sell_value / total_sell_qty if total_sell_qty > 0 else 0
+            avg_buy_price = total_buy_value / total_buy_qty if total_buy_qty > 0 else 0.0
+            avg_sell_price = total_sell_value / total_sell_qty if total_sell_qty > 0 else 0.0
             
             # Calculate realized PnL using FIFO
             realized_pnl = self._calculate_fifo_pnl(buy_orders, sell_orders)
@@ -281,42 +420,17 @@ class OrderDatabase:
         if not buy_orders or not sell_orders:
             return 0.0
         
-        # Sort orders by timestamp
+        # Sort orders by timestamp, then hand flat arrays to the FIFO kernel
         buy_queue = sorted(buy_orders, key=lambda x: x['timestamp'])
         sell_queue = sorted(sell_orders, key=lambda x: x['timestamp'])
         
-        realized_pnl = 0.0
-        buy_idx = 0
-        sell_idx = 0
-        remaining_buy_qty = buy_queue[0]['quantity'] if buy_queue else 0
-        
-        while buy_idx < len(buy_queue) and sell_idx < len(sell_queue):
-            sell_order = sell_queue[sell_idx]
-            buy_order = buy_queue[buy_idx]
-            
-            # Determine quantity to match
-            match_qty = min(remaining_buy_qty, sell_order['quantity'])
-            
-            # Calculate PnL for this match
-            buy_price = buy_order['price'] or 0
-            sell_price = sell_order['price'] or 0
-            pnl = (sell_price - buy_price) * match_qty
-            realized_pnl += pnl
-            
-            # Update remaining quantities
-            remaining_buy_qty -= match_qty
-            sell_order['quantity'] -= match_qty
-            
-            # Move to next orders if current ones are exhausted
-            if remaining_buy_qty == 0:
-                buy_idx += 1
-                if buy_idx < len(buy_queue):
-                    remaining_buy_qty = buy_queue[buy_idx]['quantity']
-            
-            if sell_order['quantity'] == 0:
-                sell_idx += 1
-        
-        return realized_pnl
+        realized_pnl, _, _ = fifo_pnl(
+            np.array([o['quantity'] for o in buy_queue], dtype=np.int64),
+            np.array([o['price'] or 0 for o in buy_queue], dtype=np.float64),
+            np.array([o['quantity'] for o in sell_queue], dtype=np.int64),
+            np.array([o['price'] or 0 for o in sell_queue], dtype=np.float64),
+        )
+        return float(realized_pnl)
     
     def get_portfolio_summary(self) -> Dict[str, Any]:
         """Get overall portfolio summary"""
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import numpy as np
+import pytest
+import test_database
+from database import OrderDatabase, fifo_pnl
+from test_database import _SYM, _EXCH, _log_orders_parallel, stress_test
+
+@pytest.fixture
+def db(tmp_path):
+    """Throwaway database; the shared trading_orders.db is never touched."""
+    return OrderDatabase(str(tmp_path / "orders.db"))
+
+def make_orders(n):
+    return [
+        {'tradingsymbol': _SYM, 'exchange': _EXCH, 'transaction_type': 'BUY', 'quantity': 1,
+         'price': 2500.0, 'order_type': 'MARKET', 'product': 'CNC', 'request_id': f'req_{i}'}
+        for i in range(n)
+    ]
+
+def test_fifo_pnl_kernel():
+    """FIFO kernel on plain arrays (AOT build if present, else JIT)"""
+    realized, remaining_qty, avg_cost = fifo_pnl(
+        np.array([10, 5], dtype=np.int64), np.array([100.0, 110.0]),
+        np.array([12], dtype=np.int64), np.array([120.0]),
+    )
+    # 10 @ 100 and 2 @ 110 sold at 120; 3 @ 110 still open
+    assert realized == 10 * 20.0 + 2 * 10.0
+    assert remaining_qty == 3
+    assert avg_cost == 110.0
+
+def test_log_order_attempt_batch(db):
+    """Batch logging returns consecutive IDs in input order, committed once"""
+    orders = make_orders(3)
+    orders[2]['transaction_type'] = 'SELL'
+    assert db.log_order_attempt_batch([]) == []
+
+    order_ids = db.log_order_attempt_batch(orders)
+
+    assert order_ids == [1, 2, 3]
+    logged = {o['id']: o for o in db.get_recent_orders(10)}
+    assert [logged[i]['request_id'] for i in order_ids] == ['req_0', 'req_1', 'req_2']
+    assert {o['status'] for o in logged.values()} == {'ATTEMPTING'}
+
+def test_update_order_result_batch(db):
+    """Batch result updates write order_id, status and error_message per row"""
+    order_ids = db.log_order_attempt_batch(make_orders(2))
+    assert db.update_order_result_batch([]) == 0
+
+    updated = db.update_order_result_batch([
+        {'order_log_id': order_ids[0], 'order_id': 'ORDER_1', 'status': 'SUCCESS'},
+        {'order_log_id': order_ids[1], 'status': 'FAILED', 'error_message': 'Insufficient margin'},
+    ])
+
+    assert updated == 2
+    logged = {o['id']: o for o in db.get_recent_orders(10)}
+    assert (logged[order_ids[0]]['order_id'], logged[order_ids[0]]['status']) == ('ORDER_1', 'SUCCESS')
+    assert (logged[order_ids[1]]['status'], logged[order_ids[1]]['error_message']) == ('FAILED', 'Insufficient margin')
+
+def test_log_orders_parallel_reports_failures(db):
+    """A swallowed log_order_attempt error comes back as None, not as a logged order"""
+    orders = make_orders(4)
+    orders[2]['quantity'] = object()  # not bindable: the INSERT fails inside log_order_attempt
+
+    results = _log_orders_parallel(orders, list(range(4)), db=db)
+
+    assert results[2] is None
+    assert sum(order_log_id is not None for order_log_id in results) == 3
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM orders WHERE status = 'SUCCESS'").fetchone()[0] == 3
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_database_functionality_on_throwaway_db(db, parallel):
+    """The demo's end-to-end scenario, run against a tmp_path database"""
+    assert test_database.test_database_functionality(parallel=parallel, db=db) is True
+    pnl = db.calculate_symbol_pnl(_SYM, _EXCH)
+    assert (pnl['total_buy_qty'], pnl['total_sell_qty'], pnl['current_position']) == (15, 15, 0)
+
+def test_stress_test_leaves_shared_db_untouched(db, tmp_path, monkeypatch):
+    """Bulk inserts go to a temporary database that is removed afterwards"""
+    monkeypatch.setattr(test_database, "order_db", db)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    stress_test(n=1000)
+
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 0
+    assert os.listdir(tmp_path) == ["orders.db"]
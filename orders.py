@@ -4,6 +4,7 @@ from kiteconnect import KiteConnect
 from typing import List, Dict, Any, Tuple, Optional
 import pandas as pd
 import random
+import re
 
 from redis_utils import get_instrument_cache, set_instrument_cache
 from memory_manager import cleanup_dataframes
@@ -14,15 +15,21 @@ logger = logging.getLogger(__name__)
 # Forward testing configuration
 FORWARD_TESTING_MODE = os.getenv("FORWARD_TESTING_MODE", "false").lower() == "true"
 
+# TradingView continuous-contract suffix, e.g. "NIFTY1!" -> "NIFTY"
+_TAIL_DIGITS = re.compile(r"[123]?!?$")
+
+
+def tv_symbol_root(tv_symbol: str) -> str:
+    """Strip the trailing '!' and a trailing 1/2/3 from a TradingView symbol."""
+    return _TAIL_DIGITS.sub("", tv_symbol, count=1)
+
 
 def get_top_3_futures_from_tv_symbol(tv_symbol: str, kite: KiteConnect, exchange: str = "NFO") -> List[Dict[str, Any]]:
     """
     Retrieve the top 3 nearest expiry futures contracts for a given symbol.
     Uses a Redis cache for the instrument list.
     """
-    symbol = tv_symbol[:-1] if tv_symbol.endswith("!") else tv_symbol
-    if symbol.endswith(("1", "2", "3")):
-        symbol = symbol[:-1]
+    symbol = tv_symbol_root(tv_symbol)
     
     try:
         df = get_instrument_cache(exchange)
@@ -91,40 +98,43 @@ def check_existing_pending_orders(
         orders = kite.orders()
         
         # Define pending statuses (orders that are not yet executed or cancelled)
-        pending_statuses = [
+        pending_statuses = {
             "OPEN",           # Order is open/pending
             "TRIGGER PENDING", # Stop-loss order waiting for trigger
             "PENDING",        # General pending status
             "AMO REQ RECEIVED",
             "MODIFY PENDING", # Order modification pending
             "CANCEL PENDING"  # Order cancellation pending (still active until cancelled)
-        ]
+        }
         
         # Convert action to transaction type for comparison
         target_transaction_type = "BUY" if action.lower() == "buy" else "SELL"
         
-        # Check for duplicate orders
-        for order in orders:
-            # Check if this order matches our criteria
-            if (order.get("tradingsymbol") == tradingsymbol and
-                order.get("exchange") == segment and
-                order.get("transaction_type") == target_transaction_type and
-                order.get("status") in pending_statuses):
-                
-                # Found a duplicate pending order
-                order_details = (
-                    f"Order ID: {order.get('order_id')}, "
-                    f"Type: {order.get('order_type')}, "
-                    f"Status: {order.get('status')}, "
-                    f"Quantity: {order.get('quantity')}, "
-                    f"Price: {order.get('price', 'Market')}"
-                )
-                
-                logger.warning(
-                    f"🔄 Duplicate pending order found for {tradingsymbol} {action.upper()}: {order_details}"
-                )
-                
-                return True, order_details
+        # First order matching our criteria, if any
+        order = next(
+            (o for o in orders
+             if o.get("tradingsymbol") == tradingsymbol and
+                o.get("exchange") == segment and
+                o.get("transaction_type") == target_transaction_type and
+                o.get("status") in pending_statuses),
+            None
+        )
+        
+        if order is not None:
+            # Found a duplicate pending order
+            order_details = (
+                f"Order ID: {order.get('order_id')}, "
+                f"Type: {order.get('order_type')}, "
+                f"Status: {order.get('status')}, "
+                f"Quantity: {order.get('quantity')}, "
+                f"Price: {order.get('price', 'Market')}"
+            )
+            
+            logger.warning(
+                f"🔄 Duplicate pending order found for {tradingsymbol} {action.upper()}: {order_details}"
+            )
+            
+            return True, order_details
         
         # No duplicate found
         logger.debug(f"✅ No duplicate pending orders found for {tradingsymbol} {action.upper()}")
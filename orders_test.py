@@ -1,7 +1,7 @@
 import pytest
 import pandas as pd
 from unittest.mock import MagicMock, patch
-from orders import get_top_3_futures_from_tv_symbol, place_order
+from orders import get_top_3_futures_from_tv_symbol, place_order, tv_symbol_root, check_existing_pending_orders
 
 @pytest.fixture
 def mock_kite():
@@ -57,4 +57,27 @@ def test_place_order_failure(mock_kite):
     order_id, error = place_order(mock_kite, "NIFTY50", "sell", 0, "NSE", 10)
     
     assert order_id is None
-    assert "Order failed" in error 
\ No newline at end of file
+    assert "Order failed" in error
+
+
+@pytest.mark.parametrize("tv_symbol, root", [
+    ("NIFTY1!", "NIFTY"),
+    ("NIFTY!", "NIFTY"),
+    ("BANKNIFTY2", "BANKNIFTY"),
+    ("RELIANCE", "RELIANCE"),
+])
+def test_tv_symbol_root(tv_symbol, root):
+    """Continuous-contract suffixes are stripped, '!' before the digit."""
+    assert tv_symbol_root(tv_symbol) == root
+
+def test_check_existing_pending_orders_finds_first_match(mock_kite):
+    """Only a pending order on the same symbol, exchange and side counts."""
+    mock_kite.orders.return_value = [
+        {'tradingsymbol': 'SBIN', 'exchange': 'NSE', 'transaction_type': 'BUY', 'status': 'COMPLETE', 'order_id': '1'},
+        {'tradingsymbol': 'SBIN', 'exchange': 'NSE', 'transaction_type': 'SELL', 'status': 'OPEN', 'order_id': '2'},
+        {'tradingsymbol': 'SBIN', 'exchange': 'NSE', 'transaction_type': 'BUY', 'status': 'OPEN', 'order_id': '3'},
+    ]
+    has_duplicate, details = check_existing_pending_orders(mock_kite, 'SBIN', 'buy', 'NSE', 1)
+    assert has_duplicate is True
+    assert "Order ID: 3" in details
+    assert check_existing_pending_orders(mock_kite, 'RELIANCE', 'buy', 'NSE', 1) == (False, None)
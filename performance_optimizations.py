@@ -4,140 +4,345 @@ These optimizations focus on reducing API calls and improving parallel processin
 """
 
 import asyncio
+import re
 import time
-from typing import Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from collections import deque
+from operator import itemgetter
+import requests
+from typing import Dict, Any, Optional, Tuple, Callable
 import logging
 
+# orders does not import this module, so a top-level import is safe and
+# avoids re-resolving these names on every webhook.
+from orders import get_top_3_futures_from_tv_symbol, place_order, tv_symbol_root
+from redis_utils import get_contracts_redis, set_contracts_redis, redis_client, aioredis_client
+
 logger = logging.getLogger(__name__)
 
+# Dedicated pool for blocking Kite calls. Bounded so that a burst of webhooks
+# queues here instead of fanning out past the broker's connection/rate limits.
+BROKER_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="kite-io")
+
+# Redis stream of slow webhook requests, shared across workers and restarts
+SLOW_REQUESTS_STREAM = "slow_requests_stream"
+SLOW_REQUESTS_MAXLEN = 1000
+
+# How long a fetched position state may be trusted to skip a repeated signal
+LAST_STATE_TTL_SECONDS = 5.0
+
 class PerformanceOptimizer:
     """Optimizations to reduce webhook processing latency."""
     
+    __slots__ = (
+        'contract_cache', 'symbol_transform_cache', 'cache_stats', '_seen_keys', 'last_state',
+        'positions_cache', 'holdings_cache', 'positions_index_cache', 'holdings_index_cache', 'fetch_locks',
+    )
+    
     def __init__(self):
-        self.contract_cache = {}  # Cache contracts within request only
+        self.contract_cache = {}  # Contract lookup futures, within request only
+        self.symbol_transform_cache: Dict[str, str] = {}  # tv_symbol -> root, within request only
         # Cache hit/miss statistics (for monitoring only)
         self.cache_stats = {
             'contract_hits': 0,
-            'contract_misses': 0
+            'contract_misses': 0,
+            'contract_redis_hits': 0,
+            'contract_redis_misses': 0,
+            'cold_misses': 0,  # key never seen by this process
+            'warm_misses': 0   # key seen in an earlier request, dropped by clear_request_cache
         }
+        self._seen_keys: set = set()  # Contract cache keys ever requested (not cleared)
+        # Last fetched qty per (account_name, tv_symbol): (monotonic timestamp, qty_held).
+        # Survives across requests; entries are dropped whenever an order is placed.
+        self.last_state: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        # Broker snapshots keyed by id(kite), within request only
+        self.positions_cache: Dict[int, list] = {}
+        self.holdings_cache: Dict[int, list] = {}
+        self.positions_index_cache: Dict[int, Dict] = {}  # (tradingsymbol, exchange) -> position
+        self.holdings_index_cache: Dict[int, Dict] = {}   # tradingsymbol -> holding
+        self.fetch_locks: Dict[Tuple[str, int], asyncio.Lock] = {}
         
     def clear_request_cache(self):
         """Clear cache at the start of each webhook request."""
         self.contract_cache.clear()
+        self.symbol_transform_cache.clear()
+        self.positions_cache.clear()
+        self.holdings_cache.clear()
+        self.positions_index_cache.clear()
+        self.holdings_index_cache.clear()
+        self.fetch_locks.clear()
         # Note: cache_stats are NOT cleared - they accumulate for monitoring
         
     def get_cache_stats(self):
         """Get cache hit/miss statistics."""
         total_contract = self.cache_stats['contract_hits'] + self.cache_stats['contract_misses']
+        total_redis = self.cache_stats['contract_redis_hits'] + self.cache_stats['contract_redis_misses']
         
         return {
             'contract_cache': {
                 'hits': self.cache_stats['contract_hits'],
                 'misses': self.cache_stats['contract_misses'],
-                'hit_rate': round(self.cache_stats['contract_hits'] / total_contract * 100, 1) if total_contract > 0 else 0
+                'cold_misses': self.cache_stats['cold_misses'],
+                'warm_misses': self.cache_stats['warm_misses'],
+                'hit_rate': round(self.cache_stats['contract_hits'] / total_contract * 100, 1) if total_contract > 0 else 0,
+                # High warm-miss rate => request scope is too narrow for this cache
+                'warm_miss_rate': round(self.cache_stats['warm_misses'] / self.cache_stats['contract_misses'] * 100, 1) if self.cache_stats['contract_misses'] > 0 else 0
+            },
+            'contract_redis_cache': {
+                'hits': self.cache_stats['contract_redis_hits'],
+                'misses': self.cache_stats['contract_redis_misses'],
+                'hit_rate': round(self.cache_stats['contract_redis_hits'] / total_redis * 100, 1) if total_redis > 0 else 0
             }
         }
 
 # Global optimizer instance
 perf_optimizer = PerformanceOptimizer()
 
-async def get_contracts_cached(tv_symbol: str, kite, segment: str) -> list:
-    """Get contracts with request-level caching to avoid duplicate API calls."""
-    cache_key = f"{tv_symbol}_{segment}"
+def _expiry_to_date(expiry) -> Optional[date]:
+    """Normalise an instrument expiry (epoch ms, str, datetime/Timestamp or date) to a date."""
+    if isinstance(expiry, int):
+        return datetime.fromtimestamp(expiry / 1000, tz=timezone.utc).date()
+    if isinstance(expiry, str):
+        try:
+            return datetime.strptime(expiry, "%Y-%m-%d").date()
+        except ValueError:
+            return datetime.fromisoformat(expiry).date()
+    if isinstance(expiry, datetime):
+        # Also covers pandas.Timestamp, which subclasses datetime
+        return expiry.date()
+    return expiry
+
+async def _load_contracts(tv_symbol: str, segment: str, kite_factory: Callable[[], Any]) -> list:
+    """Load contracts from the cross-request Redis cache, falling back to the instrument master.
+
+    Every expiry is coerced to datetime.date here, once, so consumers see a single type.
+    """
+    loop = asyncio.get_running_loop()
+    # Same root-based key as the request cache, so "NIFTY1!" and "NIFTY!" share the Redis entry
+    root = symbol_root(tv_symbol)
+    contracts = await loop.run_in_executor(None, get_contracts_redis, root, segment)
+    from_redis = contracts is not None
+    if from_redis:
+        perf_optimizer.cache_stats['contract_redis_hits'] += 1
+    else:
+        perf_optimizer.cache_stats['contract_redis_misses'] += 1
+        # The instrument lookup hits Redis and filters a DataFrame, so keep it off the event loop
+        contracts = await loop.run_in_executor(
+            BROKER_EXECUTOR, get_top_3_futures_from_tv_symbol, tv_symbol, kite_factory(), segment
+        )
+
+    for contract in contracts:
+        if contract.get('expiry'):
+            contract['expiry'] = _expiry_to_date(contract['expiry'])
+
+    if contracts and not from_redis:
+        # Write-behind: the order path doesn't wait on the cache write
+        loop.run_in_executor(None, set_contracts_redis, root, segment, contracts)
+    return contracts
+
+def symbol_root(tv_symbol: str) -> str:
+    """tv_symbol_root, memoized for the current request."""
+    root = perf_optimizer.symbol_transform_cache.get(tv_symbol)
+    if root is None:
+        root = perf_optimizer.symbol_transform_cache[tv_symbol] = tv_symbol_root(tv_symbol)
+    return root
+
+async def get_contracts_cached(tv_symbol: str, segment: str, kite_factory: Callable[[], Any]) -> list:
+    """Get contracts with request-level caching to avoid duplicate API calls.
+
+    Layers: per-request dict -> Redis (1 hour TTL) -> instrument master.
+
+    The instrument master is the same for every account, so the cache is keyed
+    on (symbol root, segment) only and kite_factory is called only on a miss;
+    "NIFTY1!" and "NIFTY!" share an entry.
+    Concurrent callers for the same key share a single in-flight lookup.
+    """
+    cache_key = f"{symbol_root(tv_symbol)}_{segment}"
     
-    if cache_key in perf_optimizer.contract_cache:
+    lookup = perf_optimizer.contract_cache.get(cache_key)
+    if lookup is not None:
         perf_optimizer.cache_stats['contract_hits'] += 1
-        logger.debug(f"Contract cache hit: {cache_key}")
-        return perf_optimizer.contract_cache[cache_key]
+        logger.debug("Contract cache hit: %s", cache_key)
+        return await asyncio.shield(lookup)
     
-    # Cache miss - fetch from API
+    # Cache miss - fall through to Redis, then the instrument master
     perf_optimizer.cache_stats['contract_misses'] += 1
-    logger.debug(f"Contract cache miss: {cache_key}")
-    
-    # Import here to avoid circular imports
-    from orders import get_top_3_futures_from_tv_symbol
+    if cache_key in perf_optimizer._seen_keys:
+        perf_optimizer.cache_stats['warm_misses'] += 1
+    else:
+        perf_optimizer.cache_stats['cold_misses'] += 1
+        perf_optimizer._seen_keys.add(cache_key)
+    if perf_optimizer.contract_cache:
+        logger.debug("Contract cache already holds %d keys this request", len(perf_optimizer.contract_cache))
+    logger.debug("Contract cache miss: %s", cache_key)
     
-    contracts = get_top_3_futures_from_tv_symbol(tv_symbol, kite, segment)
-    perf_optimizer.contract_cache[cache_key] = contracts
-    return contracts
+    lookup = asyncio.ensure_future(_load_contracts(tv_symbol, segment, kite_factory))
+    perf_optimizer.contract_cache[cache_key] = lookup
+    try:
+        return await asyncio.shield(lookup)
+    except Exception:
+        perf_optimizer.contract_cache.pop(cache_key, None)
+        raise
+
+def _positions_net(kite) -> list:
+    return kite.positions()["net"]
+
+def _holdings(kite) -> list:
+    return kite.holdings()
+
+async def _get_broker_list_cached(kind: str, cache: Dict[int, list], kite, fetch: Callable[[Any], list]) -> list:
+    """Request-scoped memoization of a broker list call, one in-flight fetch per kite."""
+    key = id(kite)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    lock_key = (kind, key)
+    lock = perf_optimizer.fetch_locks.get(lock_key)
+    if lock is None:
+        lock = perf_optimizer.fetch_locks[lock_key] = asyncio.Lock()
+    async with lock:
+        cached = cache.get(key)
+        if cached is None:
+            cached = await asyncio.get_running_loop().run_in_executor(BROKER_EXECUTOR, fetch, kite)
+            cache[key] = cached
+    return cached
+
+async def get_positions_cached(kite) -> list:
+    """Net positions for this kite account, fetched at most once per request."""
+    return await _get_broker_list_cached(
+        "positions", perf_optimizer.positions_cache, kite, _positions_net
+    )
+
+async def get_holdings_cached(kite) -> list:
+    """Holdings for this kite account, fetched at most once per request."""
+    return await _get_broker_list_cached(
+        "holdings", perf_optimizer.holdings_cache, kite, _holdings
+    )
+
+async def _fetch_positions_and_holdings(kite, segment: str) -> Tuple[list, list]:
+    """Fetch net positions, plus holdings for NSE, in parallel.
+
+    The HTTP timeout is enforced by the KiteConnect session itself
+    (see utils.KITE_HTTP_TIMEOUT). Exceptions propagate to the caller.
+    """
+    if segment == "NSE":
+        positions, holdings = await asyncio.gather(
+            get_positions_cached(kite),
+            get_holdings_cached(kite)
+        )
+        return positions, holdings
+
+    # Only need positions for futures
+    return await get_positions_cached(kite), []
+
+# C-level key extractors for the snapshot indexes
+_position_key = itemgetter("tradingsymbol", "exchange")
+_holding_key = itemgetter("tradingsymbol")
+
+# Iterating in reverse keeps the first matching entry, same as a linear scan.
+def _index_positions(positions: list) -> Dict:
+    """Index positions by (tradingsymbol, exchange) in one pass."""
+    return {_position_key(p): p for p in reversed(positions)}
+
+def _index_holdings(holdings: list) -> Dict:
+    """Index holdings by tradingsymbol in one pass."""
+    return {_holding_key(h): h for h in reversed(holdings)}
+
+def _get_index_cached(cache: Dict[int, Dict], kite, items: list, build: Callable[[list], Dict]) -> Dict:
+    """Build an index once per kite per request, alongside the cached list."""
+    key = id(kite)
+    index = cache.get(key)
+    if index is None:
+        index = cache[key] = build(items)
+    return index
+
+async def get_position_snapshot(kite, segment: str) -> Tuple[Dict, Dict]:
+    """Fetch (cached per request) and index positions/holdings for a segment.
+
+    Returns empty indexes on timeout or API failure (safe defaults).
+    """
+    if segment not in ["NFO", "MCX", "NSE"]:
+        return {}, {}
+
+    try:
+        positions, holdings = await _fetch_positions_and_holdings(kite, segment)
+    except requests.exceptions.Timeout:
+        logger.error(f"Timeout fetching holdings/positions for {segment} - Kite API did not respond in time")
+        return {}, {}
+    except Exception as e:
+        logger.error(f"Error fetching holdings/positions for {segment}: {e}")
+        return {}, {}
+
+    positions_index = _get_index_cached(perf_optimizer.positions_index_cache, kite, positions, _index_positions)
+    if segment != "NSE":
+        # Holdings are not fetched for futures; don't cache an empty index for them
+        return positions_index, {}
+    return positions_index, _get_index_cached(perf_optimizer.holdings_index_cache, kite, holdings, _index_holdings)
+
+def qty_from_snapshot(snapshot: Tuple[Dict, Dict], segment: str, tradingsymbol: str) -> int:
+    """Net quantity for tradingsymbol: holdings (incl. T1) plus net positions."""
+    positions_index, holdings_index = snapshot
+    qty_held = 0
+    existing_holdings = holdings_index.get(tradingsymbol)
+    if existing_holdings:
+        qty_held = existing_holdings["quantity"] + existing_holdings.get("t1_quantity", 0)
+    # Always add MIS positions (positive for intraday longs, negative for shorts).
+    # This allows short-position detection via negative qty_held.
+    existing_position = positions_index.get((tradingsymbol, segment))
+    if existing_position:
+        qty_held += existing_position["quantity"]
+    return qty_held
+
+def long_futures_position(snapshot: Tuple[Dict, Dict], segment: str, root: str) -> Optional[Tuple[str, int]]:
+    """First long futures position on root in segment, as (tradingsymbol, qty), if any."""
+    pattern = re.compile(rf"{re.escape(root.upper())}\d{{2}}[A-Z]{{3}}FUT")
+    for (tradingsymbol, exchange), position in snapshot[0].items():
+        if exchange == segment and position["quantity"] > 0 and pattern.fullmatch(tradingsymbol):
+            return tradingsymbol, position["quantity"]
+    return None
 
 async def get_positions_and_holdings_direct(kite, segment: str, tradingsymbol: str) -> Tuple[int, Dict]:
     """Get positions and holdings directly from API without caching."""
-    
-    if segment in ["NFO", "MCX"]:
-        # Only need positions for futures - with timeout handling
-        try:
-            # Add explicit timeout to prevent hanging
-            positions = await asyncio.wait_for(
-                asyncio.get_event_loop().run_in_executor(
-                    None, lambda: kite.positions()["net"]
-                ),
-                timeout=10.0  # 10 second timeout
-            )
-            existing_position = next(
-                (p for p in positions if p["tradingsymbol"] == tradingsymbol and p["exchange"] == segment), 
-                None
-            )
-            qty_held = existing_position["quantity"] if existing_position else 0
-            result = (qty_held, existing_position or {})
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout fetching positions for {segment} - API took longer than 10 seconds")
-            # Return safe defaults on timeout
-            result = (0, {})
-        except Exception as e:
-            logger.error(f"Error fetching positions for {segment}: {e}")
-            # Return safe defaults on API failure
-            result = (0, {})
-        
-    elif segment == "NSE":
-        # Need both holdings and positions for NSE - fetch in parallel with timeout handling
-        try:
-            async def get_holdings():
-                return await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(None, kite.holdings),
-                    timeout=10.0  # 10 second timeout
-                )
-            
-            async def get_positions():
-                return await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(None, lambda: kite.positions()["net"]),
-                    timeout=10.0  # 10 second timeout
-                )
-            
-            # Parallel execution with timeout protection
-            holdings, positions = await asyncio.gather(get_holdings(), get_positions())
-            
-            # Check holdings first
-            existing_holdings = next((h for h in holdings if h["tradingsymbol"] == tradingsymbol), None)
-            qty_held = existing_holdings["quantity"] if existing_holdings else 0
-            qty_held += existing_holdings["t1_quantity"] if existing_holdings and "t1_quantity" in existing_holdings else 0
-
-            existing_position = next(
-                (p for p in positions if p["tradingsymbol"] == tradingsymbol and p["exchange"] == segment), 
-                None
-            )
-            qty_positions = existing_position["quantity"] if existing_position else 0
-            # Always add MIS positions (positive for intraday longs, negative for shorts).
-            # This allows short-position detection via negative qty_held.
-            qty_held += qty_positions
-
-            result = (qty_held, existing_position or {})
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout fetching holdings/positions for {segment} - API took longer than 10 seconds")
-            # Return safe defaults on timeout
-            result = (0, {})
-        except Exception as e:
-            logger.error(f"Error fetching holdings/positions for {segment}: {e}")
-            # Return safe defaults on API failure
-            result = (0, {})
-    else:
-        result = (0, {})
-    
-    return result
+    snapshot = await get_position_snapshot(kite, segment)
+    existing_position = snapshot[0].get((tradingsymbol, segment))
+    return (qty_from_snapshot(snapshot, segment, tradingsymbol), existing_position or {})
+
+async def get_qty_held_only(kite, segment: str, tradingsymbol: str) -> int:
+    """Same quantity as get_positions_and_holdings_direct, without the position dict.
+
+    Used on the order path, which only needs the net quantity.
+    """
+    snapshot = await get_position_snapshot(kite, segment)
+    return qty_from_snapshot(snapshot, segment, tradingsymbol)
+
+async def resolve_contract(tv_symbol: str, segment: str,
+                           kite_factory: Callable[[], Any]) -> Tuple[list, Optional[dict]]:
+    """Account-independent contract resolution for a futures signal.
+
+    Returns the contract chain (nearest expiry first) and the contract to enter
+    when flat: the front month, or the next one if the front month expires
+    within 7 calendar days. Expiries are normalised to datetime.date when the
+    contracts are loaded.
+    """
+    contracts = await get_contracts_cached(tv_symbol, segment, kite_factory)
+    if not contracts:
+        return [], None
+
+    selected_contract = contracts[0]  # default
+    expiry = selected_contract.get('expiry')
+    if expiry:
+        today = date.today()
+        days_left = (expiry - today).days
+        if days_left <= 7 and today.weekday() < 5 and len(contracts) > 1:
+            selected_contract = contracts[1]
+    return contracts, selected_contract
 
 async def process_account_optimized(kite, account_name: str, tv_symbol: str, segment: str,
                                   action: str, price: float, quantity: int,
-                                  webhook_timestamp: str = None, request_id: str = None) -> Dict[str, Any]:
+                                  webhook_timestamp: str = None, request_id: str = None,
+                                  kite_factory: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
     """Position-state-aware order processing using only 'buy' and 'sell' actions.
 
     Both actions handle all three states automatically by reading the live position:
@@ -151,62 +356,74 @@ async def process_account_optimized(kite, account_name: str, tv_symbol: str, seg
       qty < 0  → already short, skip
       qty > 0  → long position exists, close it (SELL to close)
       qty == 0 → flat, open short (SELL to enter)
+
+    For NFO/MCX, kite_factory supplies the client for the instrument lookup
+    (default: this account's kite). resolve_contract only starts after the
+    skip checks, so skipped signals never touch the instrument master; accounts
+    processed concurrently share the in-flight lookup via get_contracts_cached.
     """
 
-    start_time = time.time()
+    start_time = time.perf_counter()
+    state_key = (account_name, tv_symbol)
+
+    # ── Fast path: repeated buy-buy / sell-sell within the TTL, no API calls ──
+    last_state = perf_optimizer.last_state.get(state_key)
+    if last_state and time.monotonic() - last_state[0] < LAST_STATE_TTL_SECONDS:
+        last_qty = last_state[1]
+        if action == "buy" and last_qty > 0:
+            processing_time = (time.perf_counter() - start_time) * 1000
+            logger.info("%s: Already holding %s (qty=%d, cached). Skipping buy. (%.1fms)",
+                        account_name, tv_symbol, last_qty, processing_time)
+            return {"status": "already holding, buy skipped", "quantity": last_qty, "processing_time_ms": processing_time}
+        if action == "sell" and last_qty < 0:
+            processing_time = (time.perf_counter() - start_time) * 1000
+            logger.info("%s: Already short %s (qty=%d, cached). Skipping sell. (%.1fms)",
+                        account_name, tv_symbol, last_qty, processing_time)
+            return {"status": "already short, sell skipped", "quantity": last_qty, "processing_time_ms": processing_time}
 
     try:
         # ── Step 1: Resolve tradingsymbol, qty_held, lot_size ────────────────
         if segment in ["NFO", "MCX"]:
-            contracts = await get_contracts_cached(tv_symbol, kite, segment)
+            if action == "buy":
+                # Any long in the root's chain means skip: no contract list or rollover needed
+                held = long_futures_position(await get_position_snapshot(kite, segment), segment,
+                                             symbol_root(tv_symbol))
+                if held:
+                    held_symbol, qty_held = held
+                    perf_optimizer.last_state[state_key] = (time.monotonic(), qty_held)
+                    processing_time = (time.perf_counter() - start_time) * 1000
+                    logger.info("%s: Already holding %s (qty=%d). Skipping buy. (%.1fms)",
+                                account_name, held_symbol, qty_held, processing_time)
+                    return {"status": "already holding, buy skipped", "quantity": qty_held, "processing_time_ms": processing_time}
+
+            # Contract lookup and positions fetch are independent: submit both, wait once
+            # (the snapshot is request-cached, so the buy check above is not refetched)
+            (contracts, entry_contract), snapshot = await asyncio.gather(
+                resolve_contract(tv_symbol, segment, kite_factory or (lambda: kite)),
+                get_position_snapshot(kite, segment)
+            )
             if not contracts:
                 return {"status": "error", "error": f"No futures contracts found for {tv_symbol}"}
 
-            # Scan contracts to find an existing position (non-zero qty)
+            # Scan contracts to find an existing position (non-zero qty).
+            # One positions fetch serves every contract in the chain.
             qty_held = 0
             tradingsymbol = None
-            existing_position = {}
             lot_size = 1
 
             for contract in contracts:
-                contract_qty, contract_pos = await get_positions_and_holdings_direct(
-                    kite, segment, contract['tradingsymbol']
-                )
+                contract_qty = qty_from_snapshot(snapshot, segment, contract['tradingsymbol'])
                 if contract_qty != 0:
                     qty_held = contract_qty
                     tradingsymbol = contract['tradingsymbol']
-                    existing_position = contract_pos
                     lot_size = contract.get('lot_size', 1)
-                    logger.info(f"{account_name}: Found position in {tradingsymbol}, qty={qty_held}")
+                    logger.info("%s: Found position in %s, qty=%d", account_name, tradingsymbol, qty_held)
                     break
 
             if qty_held == 0:
-                # Flat — select the entry contract using rollover-aware logic.
-                # Skip to the next contract if the front month expires within 7 calendar days.
-                expiry = contracts[0].get('expiry')
-                selected_contract = contracts[0]  # default
-                if expiry:
-                    from datetime import datetime, timezone
-                    import pandas as pd
-
-                    if isinstance(expiry, int):
-                        expiry = datetime.fromtimestamp(expiry / 1000, tz=timezone.utc).date()
-                    elif isinstance(expiry, str):
-                        try:
-                            expiry = datetime.strptime(expiry, "%Y-%m-%d").date()
-                        except ValueError:
-                            expiry = datetime.fromisoformat(expiry).date()
-                    elif isinstance(expiry, datetime):
-                        expiry = expiry.date()
-                    elif isinstance(expiry, pd.Timestamp):
-                        expiry = expiry.date()
-
-                    days_left = (expiry - datetime.now().date()).days
-                    if days_left <= 7 and datetime.now().date().weekday() < 5 and len(contracts) > 1:
-                        selected_contract = contracts[1]
-
-                tradingsymbol = selected_contract['tradingsymbol']
-                lot_size = selected_contract.get('lot_size', 1)
+                # Flat — enter the rollover-aware contract picked by resolve_contract
+                tradingsymbol = entry_contract['tradingsymbol']
+                lot_size = entry_contract.get('lot_size', 1)
 
             total_quantity = int(quantity * lot_size)
 
@@ -215,141 +432,155 @@ async def process_account_optimized(kite, account_name: str, tv_symbol: str, seg
             tradingsymbol = tv_symbol
             lot_size = 1
             total_quantity = quantity
-            qty_held, existing_position = await get_positions_and_holdings_direct(
-                kite, segment, tradingsymbol
-            )
+            qty_held = await get_qty_held_only(kite, segment, tradingsymbol)
+
+        perf_optimizer.last_state[state_key] = (time.monotonic(), qty_held)
 
         # ── Step 2: Place order based on current position state ───────────────
-        from orders import place_order
+        # NSE shorts/covers use MIS; NFO/MCX use NRML (default in place_order)
+        short_product = "MIS" if segment == "NSE" else None
 
         if action == "buy":
             if qty_held > 0:
                 # Already long — nothing to do
-                processing_time = (time.time() - start_time) * 1000
-                logger.info(f"{account_name}: Already holding {tradingsymbol} (qty={qty_held}). Skipping buy. ({processing_time:.1f}ms)")
+                processing_time = (time.perf_counter() - start_time) * 1000
+                logger.info("%s: Already holding %s (qty=%d). Skipping buy. (%.1fms)",
+                            account_name, tradingsymbol, qty_held, processing_time)
                 return {"status": "already holding, buy skipped", "quantity": qty_held, "processing_time_ms": processing_time}
-
             elif qty_held < 0:
                 # Short position exists — cover it (BUY to close)
-                cover_qty = abs(qty_held)
-                # NSE shorts use MIS; NFO/MCX use NRML (default in place_order)
-                product_override = "MIS" if segment == "NSE" else None
-                order_id, error = await asyncio.get_event_loop().run_in_executor(
-                    None, place_order, kite, tradingsymbol, action, price, segment,
-                    cover_qty, webhook_timestamp, tv_symbol, request_id, product_override
-                )
-                processing_time = (time.time() - start_time) * 1000
-                if order_id:
-                    logger.info(f"{account_name}: Cover (buy) order placed for {cover_qty} units of {tradingsymbol} ({processing_time:.1f}ms)")
-                    return {"status": "cover order placed", "order_id": order_id, "quantity": cover_qty, "processing_time_ms": processing_time}
-                else:
-                    logger.error(f"{account_name}: Cover (buy) order failed: {error} ({processing_time:.1f}ms)")
-                    return {"status": "buy order failed", "error": "Order failed. Please check the server logs.", "processing_time_ms": processing_time}
-
+                order_label, placed_status = "Cover (buy)", "cover order placed"
+                order_qty, product_override = abs(qty_held), short_product
             else:
                 # Flat — enter long (BUY to open)
-                order_id, error = await asyncio.get_event_loop().run_in_executor(
-                    None, place_order, kite, tradingsymbol, action, price, segment,
-                    total_quantity, webhook_timestamp, tv_symbol, request_id
-                )
-                processing_time = (time.time() - start_time) * 1000
-                if order_id:
-                    logger.info(f"{account_name}: Buy order placed for {total_quantity} units of {tradingsymbol} (lot size: {lot_size}) ({processing_time:.1f}ms)")
-                    return {"status": "buy order placed", "order_id": order_id, "quantity": total_quantity, "processing_time_ms": processing_time}
-                else:
-                    logger.error(f"{account_name}: Buy order failed: {error} ({processing_time:.1f}ms)")
-                    return {"status": "buy order failed", "error": "Order failed. Please check the server logs.", "processing_time_ms": processing_time}
+                order_label, placed_status = "Buy", "buy order placed"
+                order_qty, product_override = total_quantity, None
+            failed_status = "buy order failed"
 
         elif action == "sell":
             if qty_held < 0:
                 # Already short — nothing to do
-                processing_time = (time.time() - start_time) * 1000
-                logger.info(f"{account_name}: Already short {tradingsymbol} (qty={qty_held}). Skipping sell. ({processing_time:.1f}ms)")
+                processing_time = (time.perf_counter() - start_time) * 1000
+                logger.info("%s: Already short %s (qty=%d). Skipping sell. (%.1fms)",
+                            account_name, tradingsymbol, qty_held, processing_time)
                 return {"status": "already short, sell skipped", "quantity": qty_held, "processing_time_ms": processing_time}
-
             elif qty_held > 0:
                 # Long position exists — close it (SELL to close)
-                sell_qty = qty_held
-                order_id, error = await asyncio.get_event_loop().run_in_executor(
-                    None, place_order, kite, tradingsymbol, action, price, segment,
-                    sell_qty, webhook_timestamp, tv_symbol, request_id
-                )
-                processing_time = (time.time() - start_time) * 1000
-                if order_id:
-                    logger.info(f"{account_name}: Sell order placed for {sell_qty} units of {tradingsymbol} ({processing_time:.1f}ms)")
-                    return {"status": "sell order placed", "order_id": order_id, "quantity": sell_qty, "processing_time_ms": processing_time}
-                else:
-                    logger.error(f"{account_name}: Sell order failed: {error} ({processing_time:.1f}ms)")
-                    return {"status": "sell order failed", "error": "Order failed. Please check the server logs.", "processing_time_ms": processing_time}
-
+                order_label, placed_status = "Sell", "sell order placed"
+                order_qty, product_override = qty_held, None
             else:
                 # Flat — enter short (SELL to open)
-                # NSE shorts need MIS product; NFO/MCX use NRML (default in place_order)
-                product_override = "MIS" if segment == "NSE" else None
-                order_id, error = await asyncio.get_event_loop().run_in_executor(
-                    None, place_order, kite, tradingsymbol, action, price, segment,
-                    total_quantity, webhook_timestamp, tv_symbol, request_id, product_override
-                )
-                processing_time = (time.time() - start_time) * 1000
-                if order_id:
-                    logger.info(f"{account_name}: Short (sell) order placed for {total_quantity} units of {tradingsymbol} (lot size: {lot_size}) ({processing_time:.1f}ms)")
-                    return {"status": "short order placed", "order_id": order_id, "quantity": total_quantity, "processing_time_ms": processing_time}
-                else:
-                    logger.error(f"{account_name}: Short (sell) order failed: {error} ({processing_time:.1f}ms)")
-                    return {"status": "sell order failed", "error": "Order failed. Please check the server logs.", "processing_time_ms": processing_time}
+                order_label, placed_status = "Short (sell)", "short order placed"
+                order_qty, product_override = total_quantity, short_product
+            failed_status = "sell order failed"
 
-        processing_time = (time.time() - start_time) * 1000
-        return {"status": "unknown error", "processing_time_ms": processing_time}
+        else:
+            processing_time = (time.perf_counter() - start_time) * 1000
+            return {"status": "unknown error", "processing_time_ms": processing_time}
+
+        # The position is about to change, so the cached state is no longer valid
+        perf_optimizer.last_state.pop(state_key, None)
+        order_id, error = await asyncio.get_running_loop().run_in_executor(
+            BROKER_EXECUTOR, place_order, kite, tradingsymbol, action, price, segment,
+            order_qty, webhook_timestamp, tv_symbol, request_id, product_override
+        )
+        processing_time = (time.perf_counter() - start_time) * 1000
+        if order_id:
+            logger.info("%s: %s order placed for %d units of %s (lot size: %s) (%.1fms)",
+                        account_name, order_label, order_qty, tradingsymbol, lot_size, processing_time)
+            return {"status": placed_status, "order_id": order_id, "quantity": order_qty, "processing_time_ms": processing_time}
+        logger.error("%s: %s order failed: %s (%.1fms)", account_name, order_label, error, processing_time)
+        return {"status": failed_status, "error": "Order failed. Please check the server logs.", "processing_time_ms": processing_time}
 
     except Exception as e:
-        processing_time = (time.time() - start_time) * 1000
-        logger.exception(f"{account_name}: Error processing order. ({processing_time:.1f}ms)")
+        processing_time = (time.perf_counter() - start_time) * 1000
+        logger.exception("%s: Error processing order. (%.1fms)", account_name, processing_time)
         return {"status": "error", "error": "An internal error occurred. Please check the server logs.", "processing_time_ms": processing_time}
 
 # Performance monitoring
 class PerformanceMonitor:
     """Monitor webhook processing performance."""
     
+    __slots__ = ('request_times', '_sum', '_min', '_max')
+    
     def __init__(self):
-        self.request_times = []
-        self.slow_requests = []
+        # Bounded windows: deque drops the oldest entry on append in O(1)
+        self.request_times = deque(maxlen=100)  # Last 100 requests
+        # Slow requests go to the SLOW_REQUESTS_STREAM Redis stream, not process memory
+        # Running aggregates over request_times so get_stats is O(1)
+        self._sum = 0.0
+        self._min = None
+        self._max = None
         
-    def record_request(self, processing_time_ms: float, request_id: str):
-        """Record request processing time."""
-        self.request_times.append(processing_time_ms)
+    async def record_request(self, processing_time_ms: float, request_id: str):
+        """Record request processing time.
+
+        Async so the slow-request XADD goes through aioredis_client instead of
+        blocking the event loop on a sync Redis round-trip.
+        """
+        window = self.request_times
+        evicted = window[0] if len(window) == window.maxlen else None
+        window.append(processing_time_ms)
+        self._sum += processing_time_ms
         
-        # Keep only last 100 requests
-        if len(self.request_times) > 100:
-            self.request_times.pop(0)
+        if evicted is not None:
+            self._sum -= evicted
+            # Only rescan the window when the evicted value was an extremum;
+            # resyncing the sum on the same pass keeps float drift bounded
+            if evicted == self._min or evicted == self._max:
+                self._min = min(window)
+                self._max = max(window)
+                self._sum = sum(window)
+        if self._min is None or processing_time_ms < self._min:
+            self._min = processing_time_ms
+        if self._max is None or processing_time_ms > self._max:
+            self._max = processing_time_ms
             
-        # Track slow requests (>500ms)
+        # Track slow requests (>500ms); MAXLEN ~ keeps the stream trimmed in O(1)
         if processing_time_ms > 500:
-            self.slow_requests.append({
-                'request_id': request_id,
-                'processing_time_ms': processing_time_ms,
-                'timestamp': time.time()
-            })
-            
-        # Keep only last 20 slow requests
-        if len(self.slow_requests) > 20:
-            self.slow_requests.pop(0)
+            try:
+                await aioredis_client.xadd(
+                    SLOW_REQUESTS_STREAM,
+                    {'request_id': request_id, 'ms': processing_time_ms, 'ts': time.time()},
+                    maxlen=SLOW_REQUESTS_MAXLEN, approximate=True
+                )
+            except Exception as e:
+                logger.warning(f"Failed to record slow request {request_id}: {e}")
+
+    def _recent_slow_requests(self, count: int = 5) -> Tuple[int, list]:
+        """Total slow requests in the stream and the most recent few, oldest first."""
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.xlen(SLOW_REQUESTS_STREAM)
+            pipe.xrevrange(SLOW_REQUESTS_STREAM, count=count)
+            total, entries = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to read slow requests: {e}")
+            return 0, []
+        return total, [
+            {
+                'request_id': fields['request_id'],
+                'processing_time_ms': float(fields['ms']),
+                'timestamp': float(fields['ts'])
+            }
+            for _, fields in reversed(entries)
+        ]
             
     def get_stats(self) -> Dict[str, Any]:
         """Get performance statistics."""
         if not self.request_times:
             return {"message": "No requests recorded"}
             
-        avg_time = sum(self.request_times) / len(self.request_times)
-        max_time = max(self.request_times)
-        min_time = min(self.request_times)
+        avg_time = self._sum / len(self.request_times)
+        slow_count, recent_slow = self._recent_slow_requests()
         
         return {
             "avg_processing_time_ms": round(avg_time, 2),
-            "max_processing_time_ms": max_time,
-            "min_processing_time_ms": min_time,
+            "max_processing_time_ms": self._max,
+            "min_processing_time_ms": self._min,
             "total_requests": len(self.request_times),
-            "slow_requests_count": len(self.slow_requests),
-            "recent_slow_requests": self.slow_requests[-5:] if self.slow_requests else []
+            "slow_requests_count": slow_count,
+            "recent_slow_requests": recent_slow
         }
 
 # Global performance monitor
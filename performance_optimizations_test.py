@@ -0,0 +1,260 @@
+import asyncio
+import random
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+from performance_optimizations import (
+    perf_optimizer, process_account_optimized, get_qty_held_only, get_contracts_cached,
+    PerformanceMonitor, LAST_STATE_TTL_SECONDS
+)
+
+CONTRACTS = [
+    {'tradingsymbol': 'NIFTY24JULFUT', 'expiry': '2099-07-25', 'lot_size': 50},
+    {'tradingsymbol': 'NIFTY24AUGFUT', 'expiry': '2099-08-29', 'lot_size': 50},
+    {'tradingsymbol': 'NIFTY24SEPFUT', 'expiry': '2099-09-26', 'lot_size': 50},
+]
+
+@pytest.fixture(autouse=True)
+def reset_optimizer():
+    """Start every test with empty request and state caches."""
+    perf_optimizer.clear_request_cache()
+    perf_optimizer.last_state.clear()
+    yield
+
+@pytest.fixture
+def mock_place_order():
+    with patch('performance_optimizations.place_order', return_value=("12345", None)) as mock:
+        yield mock
+
+@pytest.fixture
+def mock_get_contracts():
+    """Instrument master lookup, with the Redis contracts layer reporting a miss."""
+    with patch('performance_optimizations.get_top_3_futures_from_tv_symbol',
+               return_value=[dict(c) for c in CONTRACTS]) as mock, \
+         patch('performance_optimizations.get_contracts_redis', return_value=None) as mock_redis, \
+         patch('performance_optimizations.set_contracts_redis'):
+        mock.redis_lookup = mock_redis
+        yield mock
+
+def make_kite(positions=None, holdings=None):
+    kite = MagicMock()
+    kite.positions.return_value = {"net": positions or []}
+    kite.holdings.return_value = holdings or []
+    return kite
+
+def test_futures_sell_scans_contracts_with_one_positions_call(mock_place_order, mock_get_contracts):
+    """All contracts are checked against a single positions fetch, in expiry order."""
+    kite = make_kite(positions=[
+        {'tradingsymbol': 'NIFTY24SEPFUT', 'exchange': 'NFO', 'quantity': 50},
+        {'tradingsymbol': 'NIFTY24AUGFUT', 'exchange': 'NFO', 'quantity': 100},
+    ])
+
+    result = asyncio.run(process_account_optimized(kite, "account", "NIFTY!", "NFO", "sell", 0, 1))
+
+    assert kite.positions.call_count == 1
+    assert result["status"] == "sell order placed"
+    assert result["quantity"] == 100
+    assert mock_place_order.call_args[0][1] == 'NIFTY24AUGFUT'
+
+def test_nse_buy_skipped_when_holding(mock_place_order):
+    """Holdings plus T1 quantity count as an existing long."""
+    kite = make_kite(holdings=[{'tradingsymbol': 'RELIANCE', 'quantity': 5, 't1_quantity': 2}])
+
+    result = asyncio.run(process_account_optimized(kite, "account", "RELIANCE", "NSE", "buy", 0, 1))
+
+    assert result["status"] == "already holding, buy skipped"
+    assert result["quantity"] == 7
+    mock_place_order.assert_not_called()
+
+def test_positions_and_holdings_fetched_once_per_request():
+    """Repeated lookups within one request reuse the cached broker lists."""
+    kite = make_kite(positions=[{'tradingsymbol': 'SBIN', 'exchange': 'NSE', 'quantity': -10}])
+
+    async def lookups():
+        return await asyncio.gather(
+            get_qty_held_only(kite, "NSE", "SBIN"),
+            get_qty_held_only(kite, "NSE", "RELIANCE"),
+        )
+
+    assert asyncio.run(lookups()) == [-10, 0]
+    assert kite.positions.call_count == 1
+    assert kite.holdings.call_count == 1
+
+    # A new request starts with an empty cache
+    perf_optimizer.clear_request_cache()
+    asyncio.run(lookups())
+    assert kite.positions.call_count == 2
+
+def test_contracts_served_from_redis_without_instrument_lookup():
+    """A Redis hit skips the instrument master and counts as a redis hit."""
+    with patch('performance_optimizations.get_contracts_redis', return_value=[dict(c) for c in CONTRACTS]) as mock_redis, \
+         patch('performance_optimizations.get_top_3_futures_from_tv_symbol') as mock_lookup:
+        hits_before = perf_optimizer.cache_stats['contract_redis_hits']
+        contracts = asyncio.run(get_contracts_cached("NIFTY1!", "NFO", MagicMock))
+
+    # Redis is keyed on the symbol root, like the request cache
+    mock_redis.assert_called_once_with("NIFTY", "NFO")
+
+    assert [c['tradingsymbol'] for c in contracts] == [c['tradingsymbol'] for c in CONTRACTS]
+    # Expiries are normalised to dates at load time
+    assert contracts[0]['expiry'] == date(2099, 7, 25)
+    mock_lookup.assert_not_called()
+    assert perf_optimizer.cache_stats['contract_redis_hits'] == hits_before + 1
+
+def test_futures_buy_skipped_before_contract_lookup(mock_place_order, mock_get_contracts):
+    """An existing long in the root's futures chain short-circuits the buy."""
+    kite = make_kite(positions=[
+        {'tradingsymbol': 'BANKNIFTY24JULFUT', 'exchange': 'NFO', 'quantity': 15},
+        {'tradingsymbol': 'NIFTY24AUGFUT', 'exchange': 'NFO', 'quantity': 50},
+    ])
+
+    kite_factory = MagicMock()
+
+    # Same call shape as the webhook: lookup client supplied lazily via kite_factory
+    result = asyncio.run(process_account_optimized(kite, "account", "NIFTY1!", "NFO", "buy", 0, 1,
+                                                   kite_factory=kite_factory))
+
+    assert result["status"] == "already holding, buy skipped"
+    assert result["quantity"] == 50
+    # Neither the Redis contracts layer nor the instrument master was touched
+    mock_get_contracts.redis_lookup.assert_not_called()
+    mock_get_contracts.assert_not_called()
+    kite_factory.assert_not_called()
+    assert perf_optimizer.contract_cache == {}
+    mock_place_order.assert_not_called()
+
+def test_contract_lookup_shared_across_accounts(mock_place_order, mock_get_contracts):
+    """Accounts processed together share one contract lookup; a skipped account starts none."""
+    long_kite = make_kite(positions=[{'tradingsymbol': 'NIFTY24JULFUT', 'exchange': 'NFO', 'quantity': 50}])
+    flat_kites = [make_kite(), make_kite()]
+
+    async def webhook():
+        return await asyncio.gather(
+            process_account_optimized(long_kite, "acc1", "NIFTY!", "NFO", "buy", 0, 1, kite_factory=MagicMock),
+            *[process_account_optimized(k, f"acc{i + 2}", "NIFTY!", "NFO", "buy", 0, 1, kite_factory=MagicMock)
+              for i, k in enumerate(flat_kites)],
+        )
+
+    held, *placed = asyncio.run(webhook())
+    assert mock_get_contracts.call_count == 1
+    assert held["status"] == "already holding, buy skipped"
+    assert [r["status"] for r in placed] == ["buy order placed"] * 2
+    # Flat account enters the front month (2099 expiry, no rollover)
+    assert mock_place_order.call_args[0][1] == 'NIFTY24JULFUT'
+
+def test_contract_misses_classified_cold_then_warm(mock_get_contracts):
+    """A key's first miss is cold; misses after a request reset are warm."""
+    stats = perf_optimizer.cache_stats
+    perf_optimizer._seen_keys.discard("NIFTY_NFO")
+    cold, warm = stats['cold_misses'], stats['warm_misses']
+
+    asyncio.run(get_contracts_cached("NIFTY!", "NFO", MagicMock))
+    asyncio.run(get_contracts_cached("NIFTY1!", "NFO", MagicMock))  # same root: request-level hit
+    perf_optimizer.clear_request_cache()
+    asyncio.run(get_contracts_cached("NIFTY!", "NFO", MagicMock))
+
+    assert (stats['cold_misses'], stats['warm_misses']) == (cold + 1, warm + 1)
+    assert perf_optimizer.get_cache_stats()['contract_cache']['warm_misses'] == warm + 1
+
+def test_repeat_buy_within_ttl_skips_without_kite_calls(mock_place_order):
+    """A same-direction repeat inside LAST_STATE_TTL_SECONDS is answered from last_state."""
+    kite = make_kite(holdings=[{'tradingsymbol': 'RELIANCE', 'quantity': 5, 't1_quantity': 0}])
+    asyncio.run(process_account_optimized(kite, "account", "RELIANCE", "NSE", "buy", 0, 1))
+    perf_optimizer.clear_request_cache()
+    repeat_kite = make_kite()
+
+    result = asyncio.run(process_account_optimized(repeat_kite, "account", "RELIANCE", "NSE", "buy", 0, 1))
+
+    assert result["status"] == "already holding, buy skipped"
+    assert result["quantity"] == 5
+    assert repeat_kite.method_calls == []
+    mock_place_order.assert_not_called()
+
+def test_repeat_buy_after_ttl_refetches_position(mock_place_order):
+    """An expired last_state entry falls through to a live position fetch."""
+    kite = make_kite(holdings=[{'tradingsymbol': 'RELIANCE', 'quantity': 5, 't1_quantity': 0}])
+    with patch('performance_optimizations.time.monotonic', return_value=1000.0):
+        asyncio.run(process_account_optimized(kite, "account", "RELIANCE", "NSE", "buy", 0, 1))
+    perf_optimizer.clear_request_cache()
+    # Position was closed elsewhere; the cached long must not be trusted past the TTL
+    flat_kite = make_kite()
+
+    with patch('performance_optimizations.time.monotonic', return_value=1000.0 + LAST_STATE_TTL_SECONDS + 0.1):
+        result = asyncio.run(process_account_optimized(flat_kite, "account", "RELIANCE", "NSE", "buy", 0, 1))
+
+    assert flat_kite.positions.call_count == 1
+    assert result["status"] == "buy order placed"
+    mock_place_order.assert_called_once()
+
+def test_order_placement_invalidates_last_state(mock_place_order):
+    """After a cover, a following sell is computed from the live position, not the cached short."""
+    short_kite = make_kite(positions=[{'tradingsymbol': 'SBIN', 'exchange': 'NSE', 'quantity': -10}])
+    result = asyncio.run(process_account_optimized(short_kite, "account", "SBIN", "NSE", "buy", 0, 1))
+    assert result["status"] == "cover order placed"
+    assert ("account", "SBIN") not in perf_optimizer.last_state
+
+    perf_optimizer.clear_request_cache()
+    # Cover filled: now flat, so a sell inside the TTL opens a short
+    flat_kite = make_kite()
+    result = asyncio.run(process_account_optimized(flat_kite, "account", "SBIN", "NSE", "sell", 0, 1))
+
+    assert flat_kite.positions.call_count == 1
+    assert result["status"] == "short order placed"
+    assert mock_place_order.call_count == 2
+
+@pytest.fixture
+def mock_redis_client():
+    """Sync client for the stats reads; the async client's XADD is exposed as mock.xadd."""
+    with patch('performance_optimizations.redis_client') as mock, \
+         patch('performance_optimizations.aioredis_client') as mock_async:
+        mock_async.xadd = AsyncMock()
+        mock.xadd = mock_async.xadd
+        yield mock
+
+def record_all(monitor, timings):
+    async def record():
+        for i, ms in enumerate(timings):
+            await monitor.record_request(ms, f"req-{i}")
+    asyncio.run(record())
+
+def test_performance_monitor_window_is_bounded(mock_redis_client):
+    """Only the most recent 100 timings are kept; slow requests go to a capped stream."""
+    monitor = PerformanceMonitor()
+    record_all(monitor, [400.0 + i for i in range(250)])
+
+    pipe = mock_redis_client.pipeline.return_value
+    pipe.execute.return_value = [149, []]
+    stats = monitor.get_stats()
+    assert stats["total_requests"] == 100
+    assert stats["min_processing_time_ms"] == 550.0
+    assert stats["slow_requests_count"] == 149
+    # Only requests over 500ms are streamed (awaited on the async client), with an approximate MAXLEN cap
+    assert mock_redis_client.xadd.await_count == 149
+    assert mock_redis_client.xadd.call_args[1] == {"maxlen": 1000, "approximate": True}
+
+def test_performance_monitor_recent_slow_requests_from_stream(mock_redis_client):
+    """The latest slow requests are read back newest-last from XREVRANGE."""
+    monitor = PerformanceMonitor()
+    record_all(monitor, [900.0])
+    pipe = mock_redis_client.pipeline.return_value
+    pipe.execute.return_value = [2, [
+        ("2-0", {"request_id": "req-2", "ms": "900.0", "ts": "1700000001.0"}),
+        ("1-0", {"request_id": "req-1", "ms": "700.0", "ts": "1700000000.0"}),
+    ]]
+
+    stats = monitor.get_stats()
+    pipe.xrevrange.assert_called_once_with("slow_requests_stream", count=5)
+    assert [r["request_id"] for r in stats["recent_slow_requests"]] == ["req-1", "req-2"]
+    assert stats["recent_slow_requests"][-1]["processing_time_ms"] == 900.0
+
+def test_performance_monitor_running_stats_match_window(mock_redis_client):
+    """Incrementally maintained avg/min/max agree with a full recomputation."""
+    monitor = PerformanceMonitor()
+    rng = random.Random(7)
+    for i in range(500):
+        record_all(monitor, [rng.uniform(1, 900)])
+        window = monitor.request_times
+        stats = monitor.get_stats()
+        assert stats["min_processing_time_ms"] == min(window)
+        assert stats["max_processing_time_ms"] == max(window)
+        assert stats["avg_processing_time_ms"] == pytest.approx(round(sum(window) / len(window), 2), abs=0.01)
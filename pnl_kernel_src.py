@@ -0,0 +1,49 @@
+"""
+FIFO PnL kernel source, kept free of import-time side effects
+
+database.py JIT-compiles it with numba; build_kernels.py compiles the same
+function ahead of time into the pnl_kernels extension module.
+"""
+
+from numba import njit
+
+
+def fifo_pnl(buy_qty, buy_px, sell_qty, sell_px):
+    """FIFO-match sells against buys, both in time order.
+
+    Returns (realized_pnl, remaining_qty, avg_cost) where remaining_qty and
+    avg_cost describe the unmatched buy lots. Sells beyond the bought
+    quantity are ignored. Inputs are int64 quantity / float64 price arrays.
+    """
+    realized_pnl = 0.0
+    buy_idx = 0
+    remaining_buy_qty = buy_qty[0] if len(buy_qty) > 0 else 0
+    
+    for sell_idx in range(len(sell_qty)):
+        sell_remaining = sell_qty[sell_idx]
+        while sell_remaining > 0 and buy_idx < len(buy_qty):
+            match_qty = min(remaining_buy_qty, sell_remaining)
+            realized_pnl += (sell_px[sell_idx] - buy_px[buy_idx]) * match_qty
+            remaining_buy_qty -= match_qty
+            sell_remaining -= match_qty
+            if remaining_buy_qty == 0:
+                buy_idx += 1
+                if buy_idx < len(buy_qty):
+                    remaining_buy_qty = buy_qty[buy_idx]
+        if buy_idx >= len(buy_qty):
+            break
+    
+    # Unmatched buy lots: the partially consumed one plus everything after it
+    remaining_qty = 0
+    remaining_cost = 0.0
+    if buy_idx < len(buy_qty):
+        remaining_qty = remaining_buy_qty
+        remaining_cost = remaining_buy_qty * buy_px[buy_idx]
+        for i in range(buy_idx + 1, len(buy_qty)):
+            remaining_qty += buy_qty[i]
+            remaining_cost += buy_qty[i] * buy_px[i]
+    avg_cost = remaining_cost / remaining_qty if remaining_qty > 0 else 0.0
+    return realized_pnl, remaining_qty, avg_cost
+
+
+fifo_pnl_jit = njit(cache=True)(fifo_pnl)
@@ -1,10 +1,14 @@
+import asyncio
 import redis
+import redis.asyncio as aioredis
 import json
+import orjson
 import pandas as pd
 import logging
-import io
+import pickle
 import time
-from typing import Optional
+from datetime import date, datetime, timezone
+from typing import Optional, List, Dict, Any, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +27,19 @@ try:
     )
     redis_client = redis.Redis(connection_pool=redis_pool)
     
+    # Separate bytes-mode pool for binary payloads (pickled instrument DataFrames)
+    redis_bytes_pool = redis.ConnectionPool(
+        host='localhost', 
+        port=6379, 
+        db=0, 
+        decode_responses=False,
+        max_connections=5,
+        retry_on_timeout=True,
+        socket_keepalive=True,
+        socket_keepalive_options={}
+    )
+    redis_bytes_client = redis.Redis(connection_pool=redis_bytes_pool)
+    
     # Test connection immediately
     redis_client.ping()
     logger.info("Connected to Redis server successfully with connection pooling.")
@@ -30,6 +47,19 @@ except Exception as e:
     logger.critical(f"Failed to connect to Redis server: {e}")
     raise RuntimeError(f"Failed to connect to Redis server: {e}")
 
+# Async pool for coroutines on the event loop; connections are opened lazily on first use.
+aioredis_pool = aioredis.ConnectionPool(
+    host='localhost', 
+    port=6379, 
+    db=0, 
+    decode_responses=True,
+    max_connections=20,
+    retry_on_timeout=True,
+    socket_keepalive=True,
+    socket_keepalive_options={}
+)
+aioredis_client = aioredis.Redis(connection_pool=aioredis_pool)
+
 def check_redis_connection():
     """Call this at app startup to ensure Redis is available."""
     try:
@@ -40,16 +70,30 @@ def check_redis_connection():
         logger.critical(f"Redis connection check failed: {e}")
         return False
 
+# Alerts are remembered for one day after they are first received
+IDEMPOTENCY_WINDOW_SECONDS = 86400
+
+def _queue_idempotency_check(pipe, symbol, timestamp, now: float):
+    """Queue a sliding-window check of (symbol, timestamp) on a pipeline.
+
+    Each symbol has one sorted set of alert timestamps scored by receive time.
+    Entries older than the window are trimmed first, so an expired member with
+    the same value cannot block the add; ZADD NX then reports 1 only for a
+    timestamp still new within the window. Replies: (trimmed, added, expire).
+    """
+    key = f"idem:{symbol}"
+    pipe.zremrangebyscore(key, "-inf", now - IDEMPOTENCY_WINDOW_SECONDS)
+    pipe.zadd(key, {timestamp: now}, nx=True)
+    pipe.expire(key, IDEMPOTENCY_WINDOW_SECONDS)
+
 def is_duplicate(symbol, timestamp, max_retries: int = 3):
-    """Checks for duplicate webhook calls using a Redis key with expiry."""
-    key = f"idempotency:{symbol}:{timestamp}"
-    
+    """Checks for duplicate webhook calls using a per-symbol sliding window in Redis."""
     for attempt in range(max_retries):
         try:
-            # Try to set the key with a 1-day expiry, only if it doesn't exist.
-            # set returns True if the key was set, False otherwise.
-            was_set = redis_client.set(key, "1", nx=True, ex=86400)
-            return not was_set  # True if duplicate (key already existed), False if new.
+            pipe = redis_client.pipeline(transaction=False)
+            _queue_idempotency_check(pipe, symbol, timestamp, time.time())
+            _, added, _ = pipe.execute()
+            return added == 0  # True if duplicate (timestamp already in the window), False if new.
         except redis.ConnectionError as e:
             if attempt < max_retries - 1:
                 logger.warning(f"Redis connection error on attempt {attempt + 1}, retrying: {e}")
@@ -63,15 +107,60 @@ def is_duplicate(symbol, timestamp, max_retries: int = 3):
             logger.error(f"Unexpected Redis error in is_duplicate: {e}")
             return False
 
+async def is_duplicate_async(symbol, timestamp, max_retries: int = 3):
+    """Non-blocking is_duplicate for async callers (e.g. the webhook handler)."""
+    for attempt in range(max_retries):
+        try:
+            async with aioredis_client.pipeline(transaction=False) as pipe:
+                _queue_idempotency_check(pipe, symbol, timestamp, time.time())
+                _, added, _ = await pipe.execute()
+            return added == 0  # True if duplicate (timestamp already in the window), False if new.
+        except redis.ConnectionError as e:
+            if attempt < max_retries - 1:
+                logger.warning(f"Redis connection error on attempt {attempt + 1}, retrying: {e}")
+                await asyncio.sleep(0.1 * (2 ** attempt))  # Exponential backoff
+                continue
+            else:
+                logger.error(f"Redis connection failed after {max_retries} attempts: {e}")
+                # Fail safe: assume not duplicate to avoid blocking trades
+                return False
+        except Exception as e:
+            logger.error(f"Unexpected Redis error in is_duplicate_async: {e}")
+            return False
+
+def is_duplicate_many(items: List[Tuple[str, str]], max_retries: int = 3) -> List[bool]:
+    """Pipelined is_duplicate for several (symbol, timestamp) pairs in one round-trip."""
+    for attempt in range(max_retries):
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            now = time.time()
+            for symbol, timestamp in items:
+                _queue_idempotency_check(pipe, symbol, timestamp, now)
+            # Three replies per item; the ZADD count is the second
+            return [added == 0 for added in pipe.execute()[1::3]]
+        except redis.ConnectionError as e:
+            if attempt < max_retries - 1:
+                logger.warning(f"Redis connection error on attempt {attempt + 1}, retrying: {e}")
+                time.sleep(0.1 * (2 ** attempt))  # Exponential backoff
+                continue
+            else:
+                logger.error(f"Redis connection failed after {max_retries} attempts: {e}")
+                # Fail safe: assume not duplicate to avoid blocking trades
+                return [False] * len(items)
+        except Exception as e:
+            logger.error(f"Unexpected Redis error in is_duplicate_many: {e}")
+            return [False] * len(items)
+
 def set_instrument_cache(segment: str, instruments_df: pd.DataFrame, max_retries: int = 3):
-    """Serializes a DataFrame to JSON and stores it in Redis for 24 hours."""
+    """Pickles a DataFrame and stores it in Redis for 24 hours."""
     key = f"instrument_cache:{segment}"
     
     for attempt in range(max_retries):
         try:
-            # Using 'split' orient is efficient for pandas DataFrames.
-            json_data = instruments_df.to_json(orient="split")
-            redis_client.set(key, json_data, ex=86400) # 24-hour expiry
+            # Pickle protocol 5 is far cheaper than per-cell JSON formatting and
+            # keeps column dtypes (e.g. expiry dates) intact.
+            data = pickle.dumps(instruments_df, protocol=5)
+            redis_bytes_client.set(key, data, ex=86400) # 24-hour expiry
             logger.info(f"Successfully cached instruments for segment {segment}.")
             return
         except redis.ConnectionError as e:
@@ -92,10 +181,9 @@ def get_instrument_cache(segment: str, max_retries: int = 3) -> Optional[pd.Data
     
     for attempt in range(max_retries):
         try:
-            json_data = redis_client.get(key)
-            if json_data:
-                # Wrap json_data in StringIO to avoid FutureWarning
-                df = pd.read_json(io.StringIO(json_data), orient="split")
+            data = redis_bytes_client.get(key)
+            if data:
+                df = _load_instrument_frame(data)
                 logger.info(f"Successfully retrieved instrument cache for {segment} from Redis.")
                 return df
             logger.warning(f"No instrument cache found in Redis for segment {segment}.")
@@ -110,4 +198,104 @@ def get_instrument_cache(segment: str, max_retries: int = 3) -> Optional[pd.Data
                 return None
         except Exception as e:
             logger.error(f"Failed to get instrument cache for {segment} from Redis: {e}")
-            return None 
\ No newline at end of file
+            return None 
+
+
+def _load_instrument_frame(data: bytes) -> pd.DataFrame:
+    """Deserialize a cached instrument frame (pickle, or legacy split-orient JSON)."""
+    if data.startswith(b"{"):
+        # Entry written by an older version as split-orient JSON; orjson parses the
+        # bytes directly, skipping the decode and pandas' JSON reader
+        payload = orjson.loads(data)
+        return pd.DataFrame(payload["data"], columns=payload["columns"], index=payload.get("index"))
+    return pickle.loads(data)
+
+
+def get_instrument_cache_many(segments: List[str], max_retries: int = 3) -> Dict[str, Optional[pd.DataFrame]]:
+    """Retrieves instrument caches for several segments in one round-trip (MGET)."""
+    keys = [f"instrument_cache:{segment}" for segment in segments]
+    
+    for attempt in range(max_retries):
+        try:
+            values = redis_bytes_client.mget(keys)
+            return {
+                segment: _load_instrument_frame(data) if data else None
+                for segment, data in zip(segments, values)
+            }
+        except redis.ConnectionError as e:
+            if attempt < max_retries - 1:
+                logger.warning(f"Redis connection error retrieving {segments}, attempt {attempt + 1}, retrying: {e}")
+                time.sleep(0.1 * (2 ** attempt))  # Exponential backoff
+                continue
+            else:
+                logger.error(f"Failed to retrieve {segments} cache after {max_retries} attempts: {e}")
+                return {segment: None for segment in segments}
+        except Exception as e:
+            logger.error(f"Failed to get instrument caches for {segments} from Redis: {e}")
+            return {segment: None for segment in segments}
+
+
+def _contract_expiry_iso(expiry) -> Optional[str]:
+    """Normalise an instrument expiry (date, datetime/Timestamp, epoch ms or str) to YYYY-MM-DD."""
+    if expiry is None:
+        return None
+    if isinstance(expiry, datetime):
+        return expiry.date().isoformat()
+    if isinstance(expiry, date):
+        return expiry.isoformat()
+    if isinstance(expiry, (int, float)):
+        return datetime.fromtimestamp(expiry / 1000, tz=timezone.utc).date().isoformat()
+    return str(expiry)[:10]
+
+
+def set_contracts_redis(root: str, segment: str, contracts: List[Dict[str, Any]], ttl: int = 3600, max_retries: int = 3):
+    """Stores the resolved futures contracts for a symbol root in Redis (1 hour by default).
+
+    Keyed on the root (orders.tv_symbol_root), so "NIFTY1!" and "NIFTY!" share an entry.
+    Only the fields consumed by the order path are kept, with expiry as an ISO date.
+    """
+    key = f"contracts:{segment}:{root}"
+    payload = json.dumps([
+        {
+            "tradingsymbol": c["tradingsymbol"],
+            "expiry": _contract_expiry_iso(c.get("expiry")),
+            "lot_size": int(c.get("lot_size", 1))
+        }
+        for c in contracts
+    ])
+    
+    for attempt in range(max_retries):
+        try:
+            redis_client.set(key, payload, ex=ttl)
+            return
+        except redis.ConnectionError as e:
+            if attempt < max_retries - 1:
+                logger.warning(f"Redis connection error caching contracts for {root}, attempt {attempt + 1}, retrying: {e}")
+                time.sleep(0.1 * (2 ** attempt))  # Exponential backoff
+                continue
+            else:
+                logger.error(f"Failed to cache contracts for {root} after {max_retries} attempts: {e}")
+        except Exception as e:
+            logger.error(f"Failed to set contracts cache for {root} in Redis: {e}")
+            break
+
+
+def get_contracts_redis(root: str, segment: str, max_retries: int = 3) -> Optional[List[Dict[str, Any]]]:
+    """Retrieves cached futures contracts for a symbol root, or None if not cached."""
+    key = f"contracts:{segment}:{root}"
+    
+    for attempt in range(max_retries):
+        try:
+            json_data = redis_client.get(key)
+            return json.loads(json_data) if json_data else None
+        except redis.ConnectionError as e:
+            if attempt < max_retries - 1:
+                logger.warning(f"Redis connection error retrieving contracts for {root}, attempt {attempt + 1}, retrying: {e}")
+                time.sleep(0.1 * (2 ** attempt))  # Exponential backoff
+                continue
+            else:
+                logger.error(f"Failed to retrieve contracts for {root} after {max_retries} attempts: {e}")
+                return None
+        except Exception as e:
+            logger.error(f"Failed to get contracts cache for {root} from Redis: {e}")
+            return None
@@ -1,29 +1,58 @@
+import asyncio
+import pickle
+import time
 import pytest
 import pandas as pd
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import redis_utils
 
 
 def test_is_duplicate_sets_and_detects_duplicate(monkeypatch):
     mock_redis = MagicMock()
-    # First call: key does not exist, so set returns True
-    mock_redis.set.return_value = True
+    pipe = mock_redis.pipeline.return_value
+    # First call: timestamp not in the window, so ZADD NX adds 1 member
+    pipe.execute.return_value = [0, 1, True]
     monkeypatch.setattr(redis_utils, "redis_client", mock_redis)
     assert redis_utils.is_duplicate("SYM", "123") is False
-    # Second call: key exists, so set returns False
-    mock_redis.set.return_value = False
+    # Second call: timestamp already present, so ZADD NX adds nothing
+    pipe.execute.return_value = [0, 0, True]
     assert redis_utils.is_duplicate("SYM", "123") is True
+    assert pipe.zadd.call_args[0][0] == "idem:SYM"
+    assert list(pipe.zadd.call_args[0][1]) == ["123"]
+    assert pipe.zadd.call_args[1] == {"nx": True}
+    # Entries older than the window are trimmed in the same round-trip, before the add
+    key, low, high = pipe.zremrangebyscore.call_args[0]
+    assert (key, low) == ("idem:SYM", "-inf")
+    assert high == pytest.approx(time.time() - 86400, abs=60)
+    assert [c[0] for c in pipe.method_calls[:3]] == ["zremrangebyscore", "zadd", "expire"]
+
+def test_is_duplicate_against_redis():
+    """Sliding window on a real server, when one is available."""
+    try:
+        redis_utils.redis_client.ping()
+    except Exception:
+        pytest.skip("Redis not available")
+    redis_utils.redis_client.delete("idem:TESTSYM")
+    assert redis_utils.is_duplicate("TESTSYM", "2024-01-01T12:00:00Z") is False
+    assert redis_utils.is_duplicate("TESTSYM", "2024-01-01T12:00:00Z") is True
+    assert redis_utils.is_duplicate("TESTSYM", "2024-01-01T12:05:00Z") is False
+    assert redis_utils.redis_client.zcard("idem:TESTSYM") == 2
+    # A repeat of a timestamp last seen outside the window is a new alert
+    redis_utils.redis_client.zadd("idem:TESTSYM", {"2024-01-01T12:00:00Z": time.time() - 86400 - 60})
+    assert redis_utils.is_duplicate("TESTSYM", "2024-01-01T12:00:00Z") is False
+    redis_utils.redis_client.delete("idem:TESTSYM")
 
 def test_set_and_get_instrument_cache(monkeypatch):
     mock_redis = MagicMock()
-    monkeypatch.setattr(redis_utils, "redis_client", mock_redis)
+    monkeypatch.setattr(redis_utils, "redis_bytes_client", mock_redis)
     df = pd.DataFrame({"instrument_type": ["FUT"], "name": ["NIFTY"], "tradingsymbol": ["NIFTY24JULFUT"], "expiry": ["2024-07-25"], "lot_size": [50]})
-    # Test set_instrument_cache
+    # Test set_instrument_cache stores pickled bytes
     redis_utils.set_instrument_cache("NFO", df)
     assert mock_redis.set.called
+    stored = mock_redis.set.call_args[0][1]
+    assert isinstance(stored, bytes)
     # Test get_instrument_cache returns DataFrame
-    json_data = df.to_json(orient="split")
-    mock_redis.get.return_value = json_data
+    mock_redis.get.return_value = stored
     result = redis_utils.get_instrument_cache("NFO")
     assert isinstance(result, pd.DataFrame)
     assert result.iloc[0]["name"] == "NIFTY"
@@ -31,6 +60,14 @@ def test_set_and_get_instrument_cache(monkeypatch):
     mock_redis.get.return_value = None
     assert redis_utils.get_instrument_cache("NFO") is None
 
+def test_get_instrument_cache_reads_legacy_json(monkeypatch):
+    mock_redis = MagicMock()
+    monkeypatch.setattr(redis_utils, "redis_bytes_client", mock_redis)
+    df = pd.DataFrame({"name": ["NIFTY"], "tradingsymbol": ["NIFTY24JULFUT"], "lot_size": [50]})
+    mock_redis.get.return_value = df.to_json(orient="split").encode("utf-8")
+    result = redis_utils.get_instrument_cache("NFO")
+    assert result.iloc[0]["tradingsymbol"] == "NIFTY24JULFUT"
+
 def test_check_redis_connection_success(monkeypatch):
     mock_redis = MagicMock()
     mock_redis.ping.return_value = True
@@ -41,4 +78,51 @@ def test_check_redis_connection_failure(monkeypatch):
     mock_redis = MagicMock()
     mock_redis.ping.side_effect = Exception("fail")
     monkeypatch.setattr(redis_utils, "redis_client", mock_redis)
-    assert redis_utils.check_redis_connection() is False 
\ No newline at end of file
+    assert redis_utils.check_redis_connection() is False 
+
+def test_set_and_get_contracts_redis(monkeypatch):
+    mock_redis = MagicMock()
+    monkeypatch.setattr(redis_utils, "redis_client", mock_redis)
+    contracts = [{"tradingsymbol": "NIFTY24JULFUT", "expiry": pd.Timestamp("2024-07-25"), "lot_size": 50}]
+    redis_utils.set_contracts_redis("NIFTY", "NFO", contracts)
+    key, payload = mock_redis.set.call_args[0]
+    assert key == "contracts:NFO:NIFTY"
+    assert mock_redis.set.call_args[1]["ex"] == 3600
+    # Round-trip keeps only the consumed fields, with an ISO expiry
+    mock_redis.get.return_value = payload
+    assert redis_utils.get_contracts_redis("NIFTY", "NFO") == [
+        {"tradingsymbol": "NIFTY24JULFUT", "expiry": "2024-07-25", "lot_size": 50}
+    ]
+    mock_redis.get.return_value = None
+    assert redis_utils.get_contracts_redis("NIFTY", "NFO") is None
+
+def test_is_duplicate_many_pipelines_window_checks(monkeypatch):
+    mock_redis = MagicMock()
+    pipe = mock_redis.pipeline.return_value
+    pipe.execute.return_value = [0, 1, True, 0, 0, True]
+    monkeypatch.setattr(redis_utils, "redis_client", mock_redis)
+    assert redis_utils.is_duplicate_many([("NIFTY", "t1"), ("BANKNIFTY", "t1")]) == [False, True]
+    mock_redis.pipeline.assert_called_once_with(transaction=False)
+    assert pipe.zadd.call_count == 2
+    assert [c[0][0] for c in pipe.zadd.call_args_list] == ["idem:NIFTY", "idem:BANKNIFTY"]
+
+def test_get_instrument_cache_many_single_round_trip(monkeypatch):
+    mock_redis = MagicMock()
+    monkeypatch.setattr(redis_utils, "redis_bytes_client", mock_redis)
+    df = pd.DataFrame({"name": ["CRUDEOIL"], "tradingsymbol": ["CRUDEOIL24JULFUT"], "lot_size": [100]})
+    mock_redis.mget.return_value = [None, pickle.dumps(df)]
+    result = redis_utils.get_instrument_cache_many(["NFO", "MCX"])
+    mock_redis.mget.assert_called_once_with(["instrument_cache:NFO", "instrument_cache:MCX"])
+    assert result["NFO"] is None
+    assert result["MCX"].iloc[0]["tradingsymbol"] == "CRUDEOIL24JULFUT"
+
+def test_is_duplicate_async(monkeypatch):
+    mock_redis = MagicMock()
+    # Async pipelines buffer commands synchronously; only execute() is awaited
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(side_effect=[[0, 1, True], [0, 0, True]])
+    mock_redis.pipeline.return_value.__aenter__.return_value = pipe
+    monkeypatch.setattr(redis_utils, "aioredis_client", mock_redis)
+    assert asyncio.run(redis_utils.is_duplicate_async("NIFTY", "t1")) is False
+    assert asyncio.run(redis_utils.is_duplicate_async("NIFTY", "t1")) is True
+    assert pipe.zadd.call_args[0][0] == "idem:NIFTY"
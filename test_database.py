@@ -4,132 +4,227 @@ Test script for the trading database and PnL calculations
 Includes forward testing mode demonstration
 """
 
+import io
 import sys
 import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import random
+import numpy as np
+import pandas as pd
 
-# Add current directory to path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Add current directory to path (once, even if this module is re-imported)
+_here = os.path.dirname(os.path.abspath(__file__))
+if _here not in sys.path:
+    sys.path.insert(0, _here)
 
-from database import order_db
+from database import OrderDatabase, order_db
 from forward_testing_config import forward_test_config, enable_forward_testing, disable_forward_testing
 
-def test_database_functionality():
-    """Test the database functionality with sample data"""
+# Demo script run via __main__; its unit tests live in database_test.py
+__test__ = False
+
+# Shared symbol/exchange strings for the sample order dicts
+_SYM = sys.intern('RELIANCE')
+_EXCH = sys.intern('NSE')
+_NFO = sys.intern('NFO')
+
+def _flush(buf):
+    """Write buffered section output to stdout in one call and reset the buffer"""
+    sys.stdout.write(buf.getvalue())
+    sys.stdout.flush()
+    buf.seek(0)
+    buf.truncate()
+
+def _log_orders_parallel(orders, fake_ids, max_workers=4, db=None):
+    """Log and fill orders from a thread pool, one SQLite connection per thread.
+
+    Exercises the log_order_attempt / update_order_result path under
+    concurrent writers; SQLite serialises the commits via its file lock.
+    Both methods swallow DB errors, so an order whose insert or update did
+    not land is rolled back and comes back as None.
+    """
+    db = db or order_db
+    local = threading.local()
+    connections = []
+    connections_lock = threading.Lock()
+
+    def thread_conn():
+        if not hasattr(local, "conn"):
+            local.conn = sqlite3.connect(db.db_path, timeout=30, check_same_thread=False)
+            with connections_lock:
+                connections.append(local.conn)
+        return local.conn
+
+    def log_one(item):
+        i, order = item
+        conn = thread_conn()
+        changes_before = conn.total_changes
+        order_log_id = db.log_order_attempt(**order, conn=conn)
+        if order_log_id is not None:
+            db.update_order_result(order_log_id, f"ORDER_{fake_ids[i]}", 'SUCCESS', conn=conn)
+        # One row inserted plus one row updated, or the order failed
+        if order_log_id is None or conn.total_changes - changes_before != 2:
+            conn.rollback()
+            return None
+        conn.commit()
+        return order_log_id
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(log_one, enumerate(orders)))
+    finally:
+        for conn in connections:
+            conn.close()
+
+def test_database_functionality(parallel=False, db=None):
+    """Test the database functionality with sample data (order_db unless db is given)"""
+    db = db or order_db
+    buf = io.StringIO()
     
-    print("🧪 Testing Trading Database Functionality")
-    print("=" * 50)
+    print("🧪 Testing Trading Database Functionality", file=buf)
+    print("=" * 50, file=buf)
     
     # Test 1: Database initialization
-    print("\n1. Testing database initialization...")
+    print("\n1. Testing database initialization...", file=buf)
     try:
-        order_db.init_database()
-        print("✅ Database initialized successfully")
+        db.init_database()
+        print("✅ Database initialized successfully", file=buf)
+        # Test data only: trade fsync-per-commit durability for insert throughput
+        if forward_test_config.is_enabled():
+            db.enable_fast_writes()
+            print("✅ WAL + synchronous=NORMAL enabled for forward testing", file=buf)
     except Exception as e:
-        print(f"❌ Database initialization failed: {e}")
+        print(f"❌ Database initialization failed: {e}", file=buf)
+        _flush(buf)
         return False
     
+    _flush(buf)
     # Test 2: Log sample orders
-    print("\n2. Testing order logging...")
+    print("\n2. Testing order logging...", file=buf)
     
     # Sample trading scenario: Buy and sell RELIANCE
     sample_orders = [
         {
-            'tradingsymbol': 'RELIANCE',
-            'exchange': 'NSE',
+            'tradingsymbol': _SYM,
+            'exchange': _EXCH,
             'transaction_type': 'BUY',
             'quantity': 10,
             'price': 2500.50,
             'order_type': 'MARKET',
             'product': 'CNC',
-            'tv_symbol': 'RELIANCE',
+            'tv_symbol': _SYM,
             'request_id': 'test_001'
         },
         {
-            'tradingsymbol': 'RELIANCE',
-            'exchange': 'NSE',
+            'tradingsymbol': _SYM,
+            'exchange': _EXCH,
             'transaction_type': 'BUY',
             'quantity': 5,
             'price': 2520.75,
             'order_type': 'MARKET',
             'product': 'CNC',
-            'tv_symbol': 'RELIANCE',
+            'tv_symbol': _SYM,
             'request_id': 'test_002'
         },
         {
-            'tradingsymbol': 'RELIANCE',
-            'exchange': 'NSE',
+            'tradingsymbol': _SYM,
+            'exchange': _EXCH,
             'transaction_type': 'SELL',
             'quantity': 8,
             'price': 2580.25,
             'order_type': 'MARKET',
             'product': 'CNC',
-            'tv_symbol': 'RELIANCE',
+            'tv_symbol': _SYM,
             'request_id': 'test_003'
         },
         {
-            'tradingsymbol': 'RELIANCE',
-            'exchange': 'NSE',
+            'tradingsymbol': _SYM,
+            'exchange': _EXCH,
             'transaction_type': 'SELL',
             'quantity': 7,
             'price': 2590.00,
             'order_type': 'MARKET',
             'product': 'CNC',
-            'tv_symbol': 'RELIANCE',
+            'tv_symbol': _SYM,
             'request_id': 'test_004'
         }
     ]
     
-    order_ids = []
-    for i, order in enumerate(sample_orders):
-        try:
-            # Log order attempt
-            order_log_id = order_db.log_order_attempt(**order)
-            
-            # Simulate successful order placement
-            fake_order_id = f"ORDER_{random.randint(100000, 999999)}"
-            order_db.update_order_result(order_log_id, fake_order_id, 'SUCCESS')
-            
-            order_ids.append(order_log_id)
-            print(f"✅ Order {i+1} logged successfully (ID: {order_log_id})")
-            
-        except Exception as e:
-            print(f"❌ Failed to log order {i+1}: {e}")
-            return False
+    # Fake broker IDs for the whole batch in one call (randint's high bound is exclusive)
+    fake_ids = np.random.randint(100000, 1000000, size=len(sample_orders)).tolist()
+    try:
+        if parallel:
+            started = time.perf_counter()
+            results = _log_orders_parallel(sample_orders, fake_ids, db=db)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            order_ids = [order_log_id for order_log_id in results if order_log_id is not None]
+            failed = len(results) - len(order_ids)
+            if failed:
+                print(f"❌ {failed} of {len(results)} orders failed to log from 4 threads", file=buf)
+                _flush(buf)
+                return False
+            print(f"✅ {len(order_ids)} orders logged from 4 threads in {elapsed_ms:.1f}ms", file=buf)
+        else:
+            # One transaction, one INSERT and one UPDATE statement for the whole batch
+            with db.transaction() as conn:
+                order_ids = db.log_order_attempt_batch(sample_orders, conn=conn)
+                if len(order_ids) != len(sample_orders):
+                    raise RuntimeError("batch insert failed")
+                
+                # Simulate successful order placement
+                updated = db.update_order_result_batch([
+                    {'order_log_id': order_log_id, 'order_id': f"ORDER_{fake_id}", 'status': 'SUCCESS'}
+                    for fake_id, order_log_id in zip(fake_ids, order_ids)
+                ], conn=conn)
+                if updated != len(order_ids):
+                    raise RuntimeError("batch update failed")
+    except Exception as e:
+        print(f"❌ Failed to log orders: {e}", file=buf)
+        _flush(buf)
+        return False
+    
+    for i, order_log_id in enumerate(order_ids):
+        print(f"✅ Order {i+1} logged successfully (ID: {order_log_id})", file=buf)
     
+    _flush(buf)
     # Test 3: Retrieve recent orders
-    print("\n3. Testing order retrieval...")
+    print("\n3. Testing order retrieval...", file=buf)
     try:
-        recent_orders = order_db.get_recent_orders(10)
-        print(f"✅ Retrieved {len(recent_orders)} recent orders")
+        recent_orders = db.get_recent_orders(10)
+        print(f"✅ Retrieved {len(recent_orders)} recent orders", file=buf)
         
         if recent_orders:
-            print("\nSample order:")
+            print("\nSample order:", file=buf)
             order = recent_orders[0]
-            print(f"   Symbol: {order['tradingsymbol']}")
-            print(f"   Type: {order['transaction_type']}")
-            print(f"   Quantity: {order['quantity']}")
-            print(f"   Price: ₹{order['price']}")
-            print(f"   Status: {order['status']}")
+            print(f"   Symbol: {order['tradingsymbol']}", file=buf)
+            print(f"   Type: {order['transaction_type']}", file=buf)
+            print(f"   Quantity: {order['quantity']}", file=buf)
+            print(f"   Price: ₹{order['price']}", file=buf)
+            print(f"   Status: {order['status']}", file=buf)
             
     except Exception as e:
-        print(f"❌ Failed to retrieve orders: {e}")
+        print(f"❌ Failed to retrieve orders: {e}", file=buf)
+        _flush(buf)
         return False
     
+    _flush(buf)
     # Test 4: Calculate PnL
-    print("\n4. Testing PnL calculation...")
+    print("\n4. Testing PnL calculation...", file=buf)
     try:
-        pnl_data = order_db.calculate_symbol_pnl('RELIANCE', 'NSE')
+        pnl_data = db.calculate_symbol_pnl(_SYM, _EXCH)
         
         if pnl_data:
-            print("✅ PnL calculation successful")
-            print(f"   Total Buy Qty: {pnl_data['total_buy_qty']}")
-            print(f"   Total Sell Qty: {pnl_data['total_sell_qty']}")
-            print(f"   Current Position: {pnl_data['current_position']}")
-            print(f"   Avg Buy Price: ₹{pnl_data['avg_buy_price']:.2f}")
-            print(f"   Avg Sell Price: ₹{pnl_data['avg_sell_price']:.2f}")
-            print(f"   Realized P&L: ₹{pnl_data['realized_pnl']:.2f}")
+            print("✅ PnL calculation successful", file=buf)
+            print(f"   Total Buy Qty: {pnl_data['total_buy_qty']}", file=buf)
+            print(f"   Total Sell Qty: {pnl_data['total_sell_qty']}", file=buf)
+            print(f"   Current Position: {pnl_data['current_position']}", file=buf)
+            print(f"   Avg Buy Price: ₹{pnl_data['avg_buy_price']:.2f}", file=buf)
+            print(f"   Avg Sell Price: ₹{pnl_data['avg_sell_price']:.2f}", file=buf)
+            print(f"   Realized P&L: ₹{pnl_data['realized_pnl']:.2f}", file=buf)
             
             # Verify the calculation manually
             expected_buy_qty = 15  # 10 + 5
@@ -139,47 +234,96 @@ def test_database_functionality():
             if (pnl_data['total_buy_qty'] == expected_buy_qty and 
                 pnl_data['total_sell_qty'] == expected_sell_qty and
                 pnl_data['current_position'] == expected_position):
-                print("✅ PnL calculations are correct")
+                print("✅ PnL calculations are correct", file=buf)
             else:
-                print("⚠️  PnL calculations may have issues")
+                print("⚠️  PnL calculations may have issues", file=buf)
                 
         else:
-            print("❌ PnL calculation returned empty data")
+            print("❌ PnL calculation returned empty data", file=buf)
+            _flush(buf)
             return False
             
     except Exception as e:
-        print(f"❌ Failed to calculate PnL: {e}")
+        print(f"❌ Failed to calculate PnL: {e}", file=buf)
+        _flush(buf)
         return False
     
+    _flush(buf)
     # Test 5: Portfolio summary
-    print("\n5. Testing portfolio summary...")
+    print("\n5. Testing portfolio summary...", file=buf)
     try:
-        portfolio = order_db.get_portfolio_summary()
+        portfolio = db.get_portfolio_summary()
         
         if portfolio:
-            print("✅ Portfolio summary generated")
-            print(f"   Total Symbols: {portfolio['total_symbols']}")
-            print(f"   Total Realized P&L: ₹{portfolio['total_realized_pnl']:.2f}")
-            print(f"   Total Positions: {portfolio['total_positions']}")
+            print("✅ Portfolio summary generated", file=buf)
+            print(f"   Total Symbols: {portfolio['total_symbols']}", file=buf)
+            print(f"   Total Realized P&L: ₹{portfolio['total_realized_pnl']:.2f}", file=buf)
+            print(f"   Total Positions: {portfolio['total_positions']}", file=buf)
             
         else:
-            print("❌ Portfolio summary returned empty data")
+            print("❌ Portfolio summary returned empty data", file=buf)
+            _flush(buf)
             return False
             
     except Exception as e:
-        print(f"❌ Failed to generate portfolio summary: {e}")
+        print(f"❌ Failed to generate portfolio summary: {e}", file=buf)
+        _flush(buf)
         return False
     
-    print("\n" + "=" * 50)
-    print("🎉 All database tests passed successfully!")
-    print("\n📊 Your trading database is ready for:")
-    print("   • Order logging before placement")
-    print("   • Real-time PnL tracking")
-    print("   • FIFO-based profit/loss calculations")
-    print("   • Portfolio performance monitoring")
+    print("\n" + "=" * 50, file=buf)
+    print("🎉 All database tests passed successfully!", file=buf)
+    print("\n📊 Your trading database is ready for:", file=buf)
+    print("   • Order logging before placement", file=buf)
+    print("   • Real-time PnL tracking", file=buf)
+    print("   • FIFO-based profit/loss calculations", file=buf)
+    print("   • Portfolio performance monitoring", file=buf)
     
+    _flush(buf)
     return True
 
+def stress_test(n=100_000):
+    """Bulk-insert n synthetic filled orders with a single DataFrame.to_sql call
+
+    Runs against a throwaway database that is removed afterwards, so the
+    synthetic rows never reach order_db's P&L, portfolio or dashboard.
+    """
+    print(f"\n🏋️ Stress test: inserting {n:,} orders via DataFrame.to_sql...")
+    
+    # Alternate BUY/SELL so the symbol nets out roughly flat
+    sides = np.tile(np.array(['BUY', 'SELL']), n // 2 + 1)[:n]
+    now = datetime.now()
+    df = pd.DataFrame({
+        'tradingsymbol': _SYM,
+        'exchange': _EXCH,
+        'transaction_type': sides,
+        'quantity': np.random.randint(1, 100, size=n),
+        'price': np.round(np.random.uniform(2400, 2600, size=n), 2),
+        'order_type': 'MARKET',
+        'product': 'CNC',
+        'timestamp': now,
+        'tv_symbol': _SYM,
+        'request_id': [f"stress_{i:06d}" for i in range(n)],
+        'order_id': [f"STRESS_{i:06d}" for i in range(n)],
+        'status': 'FORWARD_TEST_SUCCESS',
+        'updated_at': now,
+    })
+    
+    # The directory (db plus any -wal/-shm files) is deleted on exit
+    with tempfile.TemporaryDirectory(prefix="stress_db_") as tmp_dir:
+        stress_db = OrderDatabase(os.path.join(tmp_dir, "stress_orders.db"))
+        started = time.perf_counter()
+        with stress_db.transaction() as conn:
+            # method='multi' packs each chunk into one multi-row INSERT; 500 rows x 13
+            # columns stays under SQLite's bound-variable limit
+            df.to_sql('orders', conn, if_exists='append', index=False, method='multi', chunksize=500)
+        elapsed = time.perf_counter() - started
+        
+        with stress_db.get_connection() as conn:
+            inserted = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    
+    print(f"✅ Inserted {inserted:,} orders in {elapsed:.2f}s ({n / elapsed:,.0f} rows/s)")
+    return elapsed
+
 def create_sample_futures_data():
     """Create sample futures trading data"""
     print("\n🔮 Creating sample futures trading data...")
@@ -188,7 +332,7 @@ def create_sample_futures_data():
     futures_orders = [
         {
             'tradingsymbol': 'NIFTY24FEB22000CE',
-            'exchange': 'NFO',
+            'exchange': _NFO,
             'transaction_type': 'BUY',
             'quantity': 50,
             'price': 150.25,
@@ -199,7 +343,7 @@ def create_sample_futures_data():
         },
         {
             'tradingsymbol': 'NIFTY24FEB22000CE',
-            'exchange': 'NFO',
+            'exchange': _NFO,
             'transaction_type': 'SELL',
             'quantity': 50,
             'price': 175.80,
@@ -210,14 +354,16 @@ def create_sample_futures_data():
         }
     ]
     
-    for i, order in enumerate(futures_orders):
-        try:
-            order_log_id = order_db.log_order_attempt(**order)
-            fake_order_id = f"FUT_ORDER_{random.randint(100000, 999999)}"
-            order_db.update_order_result(order_log_id, fake_order_id, 'SUCCESS')
-            print(f"✅ Futures order {i+1} logged successfully")
-        except Exception as e:
-            print(f"❌ Failed to log futures order {i+1}: {e}")
+    fake_ids = np.random.randint(100000, 1000000, size=len(futures_orders)).tolist()
+    with order_db.transaction() as conn:
+        for i, order in enumerate(futures_orders):
+            try:
+                order_log_id = order_db.log_order_attempt(**order, conn=conn)
+                fake_order_id = f"FUT_ORDER_{fake_ids[i]}"
+                order_db.update_order_result(order_log_id, fake_order_id, 'SUCCESS', conn=conn)
+                print(f"✅ Futures order {i+1} logged successfully")
+            except Exception as e:
+                print(f"❌ Failed to log futures order {i+1}: {e}")
 
 if __name__ == "__main__":
     print("🚀 Starting Trading Database Test Suite")
@@ -225,8 +371,11 @@ if __name__ == "__main__":
     # Show current trading mode
     forward_test_config.print_status()
     
-    # Run main tests
-    success = test_database_functionality()
+    # Run main tests (--parallel logs the sample orders from a thread pool)
+    success = test_database_functionality(parallel="--parallel" in sys.argv[1:])
+    
+    if success and "--stress" in sys.argv[1:]:
+        stress_test()
     
     if success:
         # Create additional sample data
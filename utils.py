@@ -1,9 +1,12 @@
 import os
+import time
+import functools
+import hashlib
 from dotenv import load_dotenv
 from kiteconnect import KiteConnect
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 import pandas as pd
-from typing import Optional
+from typing import Optional, Dict, List, Tuple
 import logging
 
 # Load environment variables
@@ -12,9 +15,61 @@ load_dotenv()
 API_KEY = os.getenv("KITE_API_KEY")
 API_SECRET = os.getenv("KITE_API_SECRET")
 ACCESS_TOKEN_PATH = os.getenv("ACCESS_TOKEN_PATH", "access_token.txt")
+# Columns returned by kite.historical_data with oi=False
+CANDLE_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+# Upper bound on how old fetch_latest_data results may be; within it, repeat
+# calls (including the still-forming last candle) are served from memory
+HISTORICAL_MAX_STALENESS_SECONDS = 60
+# Lookback window per (interval, lookback), built once instead of on every fetch
+_DELTA_CACHE: Dict[Tuple[str, int], timedelta] = {}
+# (connect, read) timeout in seconds, passed straight through to requests by KiteConnect
+KITE_HTTP_TIMEOUT = (2.0, 10.0)
+
+# A stored token validated this recently is trusted without calling kite.profile()
+TOKEN_VALIDATION_TTL = timedelta(hours=1)
 
 logger = logging.getLogger(__name__)
 
+# (api_key, client) reused across zerodha_login calls so the requests.Session
+# inside KiteConnect keeps its pooled keep-alive connections
+_kite_singleton: Optional[Tuple[str, KiteConnect]] = None
+
+def _get_kite(api_key: str) -> KiteConnect:
+    global _kite_singleton
+    if _kite_singleton is None or _kite_singleton[0] != api_key:
+        _kite_singleton = (api_key, KiteConnect(api_key=api_key, timeout=KITE_HTTP_TIMEOUT))
+    return _kite_singleton[1]
+
+@functools.lru_cache(maxsize=4)
+def _load_token(path: str, mtime_ns: int) -> str:
+    """Token file contents; mtime_ns in the cache key makes a rewritten file re-read."""
+    with open(path, "r") as f:
+        return f.read().strip()
+
+def _token_marker_path(access_token_path: str) -> str:
+    """Sibling marker file, e.g. access_token.txt -> access_token.validated"""
+    return os.path.splitext(access_token_path)[0] + ".validated"
+
+def _token_digest(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()[:16]
+
+def _recently_validated(marker_path: str, access_token: str) -> bool:
+    """True if the marker vouches for this exact token within TOKEN_VALIDATION_TTL."""
+    try:
+        with open(marker_path, "r") as f:
+            validated_at, digest = f.read().split()
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(validated_at)
+    except (OSError, ValueError, TypeError):
+        return False
+    return digest == _token_digest(access_token) and age < TOKEN_VALIDATION_TTL
+
+def _mark_validated(marker_path: str, access_token: str):
+    try:
+        with open(marker_path, "w") as f:
+            f.write(f"{datetime.now(timezone.utc).isoformat()} {_token_digest(access_token)}")
+    except OSError as e:
+        logger.warning(f"Could not write token validation marker: {e}")
+
 def zerodha_login(
     api_key: Optional[str] = None,
     api_secret: Optional[str] = None,
@@ -30,14 +85,18 @@ def zerodha_login(
     if not api_key or not api_secret:
         logger.error("API key/secret not provided. Set env variables or pass as arguments.")
         raise Exception("API key/secret not provided. Set env variables or pass as arguments.")
-    kite = KiteConnect(api_key=api_key)
+    kite = _get_kite(api_key)
     # Try loading access token
     if os.path.exists(access_token_path):
-        with open(access_token_path, "r") as f:
-            access_token = f.read().strip()
+        access_token = _load_token(access_token_path, os.stat(access_token_path).st_mtime_ns)
         kite.set_access_token(access_token)
+        marker_path = _token_marker_path(access_token_path)
+        if _recently_validated(marker_path, access_token):
+            logger.info("Access token loaded (validated within the last hour).")
+            return kite
         try:
             kite.profile()  # Validate token
+            _mark_validated(marker_path, access_token)
             logger.info("Access token loaded and verified.")
             return kite
         except Exception as e:
@@ -47,44 +106,70 @@ def zerodha_login(
 
 
 
+@functools.lru_cache(maxsize=128)
+def _cached_historical(
+    kite: KiteConnect,
+    instrument_token: int,
+    interval: str,
+    lookback: int,
+    bucket: int
+) -> Tuple[dict, ...]:
+    """Historical candles, fetched once per (token, interval, lookback) per staleness bucket."""
+    delta = _DELTA_CACHE.get((interval, lookback))
+    if delta is None:
+        delta = _DELTA_CACHE[(interval, lookback)] = timedelta(minutes=lookback*15)
+    to_date = datetime.now()
+    from_date = to_date - delta
+    return tuple(kite.historical_data(
+        instrument_token=instrument_token,
+        from_date=from_date,
+        to_date=to_date,
+        interval=interval,
+        continuous=False,
+        oi=False
+    ))
+
 def fetch_latest_data(
     kite: KiteConnect,
     instrument_token: int,
     interval: str = '15minute',
-    lookback: int = 15*4
+    lookback: int = 15*4,
+    max_staleness: int = HISTORICAL_MAX_STALENESS_SECONDS
 ) -> pd.DataFrame:
     """
     Fetch the latest historical data for a given instrument.
+    Results, including the still-forming last candle, are served from memory
+    for up to max_staleness seconds; at most one REST call per bucket.
     Args:
         kite: KiteConnect API instance
         instrument_token: Instrument token (int)
         interval: Data interval (default '15minute')
         lookback: Number of candles to look back (default 60)
+        max_staleness: Maximum age in seconds of a cached result (default 60)
     Returns:
         Pandas DataFrame with historical data.
     Raises:
         Exception if fetching data fails.
     """
     try:
-        to_date = datetime.now()
-        from_date = to_date - timedelta(minutes=lookback*15)
-        data = kite.historical_data(
-            instrument_token=instrument_token,
-            from_date=from_date,
-            to_date=to_date,
-            interval=interval,
-            continuous=False,
-            oi=False
-        )
-        df = pd.DataFrame(data)
+        bucket = int(time.time()) // max_staleness
+        data = _cached_historical(kite, instrument_token, interval, lookback, bucket)
+        df = pd.DataFrame.from_records(data, columns=CANDLE_COLUMNS)
         if not df.empty:
-            df['date'] = pd.to_datetime(df['date'])
             df.set_index('date', inplace=True)
+            # Kite already returns datetimes; only parse if they came back as strings
+            if not pd.api.types.is_datetime64_any_dtype(df.index):
+                df.index = pd.to_datetime(df.index)
         return df
     except Exception as e:
         logger.error(f"Failed to fetch latest data: {e}")
         raise
 
+@functools.lru_cache(maxsize=4)
+def _instruments_index(kite: KiteConnect, exchange: str, day: date) -> Dict[str, int]:
+    """tradingsymbol -> instrument_token for an exchange, downloaded once per kite per day."""
+    return {inst['tradingsymbol']: inst['instrument_token'] for inst in kite.instruments(exchange)}
+
 def get_instrument_token(
     kite: KiteConnect,
     tradingsymbol: str
@@ -98,12 +183,34 @@ def get_instrument_token(
         Instrument token (int) if found, else None.
     """
     try:
-        instruments = kite.instruments("NSE")
-        for inst in instruments:
-            if inst['tradingsymbol'] == tradingsymbol:
-                return inst['instrument_token']
+        token = _instruments_index(kite, "NSE", date.today()).get(tradingsymbol)
+        if token is not None:
+            return token
         logger.warning(f"Instrument token not found for {tradingsymbol}")
         return None
     except Exception as e:
         logger.error(f"Error fetching instrument token: {e}")
         return None
+
+def get_instrument_tokens(
+    kite: KiteConnect,
+    tradingsymbols: List[str]
+) -> Dict[str, int]:
+    """
+    Bulk variant of get_instrument_token for startup-time lookups.
+    Args:
+        kite: KiteConnect API instance
+        tradingsymbols: NSE trading symbols
+    Returns:
+        Dict of tradingsymbol -> instrument token; symbols not found are omitted.
+    """
+    try:
+        index = _instruments_index(kite, "NSE", date.today())
+        tokens = {symbol: index[symbol] for symbol in tradingsymbols if symbol in index}
+        missing = len(tradingsymbols) - len(tokens)
+        if missing:
+            logger.warning(f"Instrument token not found for {missing} of {len(tradingsymbols)} symbols")
+        return tokens
+    except Exception as e:
+        logger.error(f"Error fetching instrument tokens: {e}")
+        return {}
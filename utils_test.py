@@ -1,14 +1,24 @@
+import os
 import pytest
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
-from utils import zerodha_login
+import utils
+from utils import zerodha_login, get_instrument_token, get_instrument_tokens, fetch_latest_data
 
+@pytest.fixture(autouse=True)
+def reset_kite_singleton(monkeypatch):
+    """Each test builds its own (mocked) KiteConnect and reads the token file afresh."""
+    monkeypatch.setattr(utils, "_kite_singleton", None)
+    utils._load_token.cache_clear()
+
+@patch('utils.os.stat')
 @patch('utils.os.path.exists')
 @patch('utils.open', new_callable=MagicMock)
 @patch('utils.KiteConnect')
-def test_zerodha_login_with_access_token(mock_kite_connect, mock_open, mock_exists):
+def test_zerodha_login_with_access_token(mock_kite_connect, mock_open, mock_exists, mock_stat):
     """Test login succeeds when access_token.txt exists."""
     mock_exists.return_value = True
-    mock_open.return_value.read.return_value = "test_access_token"
+    mock_open.return_value.__enter__.return_value.read.return_value = "test_access_token"
     mock_kite_instance = MagicMock()
     mock_kite_connect.return_value = mock_kite_instance
     
@@ -27,4 +37,92 @@ def test_zerodha_login_without_access_token(mock_kite_connect, mock_exists):
     
     zerodha_login()
     
-    mock_kite_instance.set_access_token.assert_not_called() 
\ No newline at end of file
+    mock_kite_instance.set_access_token.assert_not_called() 
+
+@patch('utils.KiteConnect')
+def test_zerodha_login_skips_profile_when_recently_validated(mock_kite_connect, tmp_path):
+    """A successful validation is remembered for an hour, for that token only."""
+    token_path = tmp_path / "access_token.txt"
+    token_path.write_text("token_a")
+    mock_kite_instance = mock_kite_connect.return_value
+
+    zerodha_login(api_key="k", api_secret="s", access_token_path=str(token_path))
+    zerodha_login(api_key="k", api_secret="s", access_token_path=str(token_path))
+    assert mock_kite_instance.profile.call_count == 1
+    assert (tmp_path / "access_token.validated").exists()
+
+    # A new token is validated again
+    token_path.write_text("token_b")
+    stat = token_path.stat()
+    os.utime(token_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))  # coarse fs clocks
+    zerodha_login(api_key="k", api_secret="s", access_token_path=str(token_path))
+    assert mock_kite_instance.profile.call_count == 2
+
+@patch('utils.os.path.exists')
+@patch('utils.KiteConnect')
+def test_zerodha_login_reuses_kite_instance(mock_kite_connect, mock_exists):
+    """The client (and its HTTP session) is built once per api key."""
+    mock_exists.return_value = False
+
+    first = zerodha_login(api_key="k", api_secret="s")
+    second = zerodha_login(api_key="k", api_secret="s")
+    assert first is second
+    assert mock_kite_connect.call_count == 1
+
+    zerodha_login(api_key="other", api_secret="s")
+    assert mock_kite_connect.call_count == 2
+
+def test_token_file_read_once_until_modified(tmp_path):
+    token_path = tmp_path / "access_token.txt"
+    token_path.write_text("token_a\n")
+    mtime_ns = token_path.stat().st_mtime_ns
+
+    assert utils._load_token(str(token_path), mtime_ns) == "token_a"
+    token_path.write_text("token_b\n")
+    # Same mtime key: served from cache without touching the file
+    assert utils._load_token(str(token_path), mtime_ns) == "token_a"
+    assert utils._load_token(str(token_path), mtime_ns + 1) == "token_b"
+
+def test_get_instrument_token_downloads_instruments_once():
+    kite = MagicMock()
+    kite.instruments.return_value = [
+        {'tradingsymbol': 'RELIANCE', 'instrument_token': 738561},
+        {'tradingsymbol': 'SBIN', 'instrument_token': 779521},
+    ]
+    assert get_instrument_token(kite, 'SBIN') == 779521
+    assert get_instrument_token(kite, 'RELIANCE') == 738561
+    assert get_instrument_token(kite, 'UNKNOWN') is None
+    kite.instruments.assert_called_once_with("NSE")
+
+def test_get_instrument_tokens_bulk_lookup():
+    kite = MagicMock()
+    kite.instruments.return_value = [
+        {'tradingsymbol': 'RELIANCE', 'instrument_token': 738561},
+        {'tradingsymbol': 'SBIN', 'instrument_token': 779521},
+    ]
+    assert get_instrument_tokens(kite, ['SBIN', 'UNKNOWN', 'RELIANCE']) == {'SBIN': 779521, 'RELIANCE': 738561}
+    kite.instruments.assert_called_once_with("NSE")
+
+def test_fetch_latest_data_one_call_per_bucket():
+    """Two calls in the same staleness bucket make one historical_data round trip."""
+    candle = {'date': datetime(2024, 1, 1, 9, 15), 'open': 100, 'high': 101, 'low': 99, 'close': 100.5, 'volume': 1000}
+    kite = MagicMock()
+    kite.historical_data.return_value = [dict(candle)]
+    bucket_start = 1704101400  # a multiple of HISTORICAL_MAX_STALENESS_SECONDS
+    with patch('utils.time.time') as mock_time:
+        mock_time.return_value = bucket_start + 1
+        first = fetch_latest_data(kite, 738561)
+        mock_time.return_value = bucket_start + utils.HISTORICAL_MAX_STALENESS_SECONDS - 1
+        second = fetch_latest_data(kite, 738561)
+        assert kite.historical_data.call_count == 1
+        # Past the staleness bound the forming candle is refetched
+        kite.historical_data.return_value = [dict(candle, close=102.0)]
+        mock_time.return_value = bucket_start + utils.HISTORICAL_MAX_STALENESS_SECONDS
+        third = fetch_latest_data(kite, 738561)
+        assert kite.historical_data.call_count == 2
+    # 60 candles * 15 minutes of lookback, ending now
+    call = kite.historical_data.call_args[1]
+    assert call['to_date'] - call['from_date'] == timedelta(minutes=900)
+    assert first.equals(second)
+    assert third['close'].iloc[-1] == 102.0
+    assert list(first.columns) == ['open', 'high', 'low', 'close', 'volume']